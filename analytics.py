@@ -0,0 +1,288 @@
+import heapq
+import atexit
+import sqlite3
+import threading
+from collections import defaultdict
+
+from timeseries import TimeSeries
+from heavy_hitters import SpaceSaving
+
+COUNTER_KEYS = ("commands_used", "game_details_views", "game_shares", "feedback_types")
+SEARCHES_KEY = "top_searches" # Search queries are free text, so they go to a bounded SpaceSaving summary instead
+SERIES_METRICS = COUNTER_KEYS + (SEARCHES_KEY, "new_users") # Tracked over time in minute, hour and day buckets
+LEADERS_SIZE = 10 # Highest-count keys kept in order per counter, so top() needn't sort
+
+class AnalyticsStore:
+    """
+    In-memory bot usage analytics with debounced persistence to the SQLite store.
+    Tracking only updates memory and records a delta; a background thread adds the
+    pending deltas and new users to the database every `flush_interval` seconds, or as
+    soon as `flush_events` events are pending, and once more at interpreter shutdown.
+    Every event is also counted in `series`, a TimeSeries of minute/hour/day buckets
+    per metric, for trends over time. Search queries are counted approximately in
+    `searches`, a SpaceSaving summary of at most `search_capacity` queries.
+    Each counter's LEADERS_SIZE highest keys are kept in order as events arrive, and
+    `versions` records a change count per part of the data, so reports can be cached.
+    With `shared` set (several worker processes on one database), each flush also pulls
+    back the totals from every process: only the counters another process has written
+    since the last pull (SQLiteStore.counter_versions) are re-read, and the user total
+    is a COUNT(*). Unique users then live in the database; the in-memory set only holds
+    the users this process has seen, and an unseen one is looked up there once.
+    """
+
+    def __init__(self, store, flush_interval=30.0, flush_events=50, shared=False, search_capacity=1000):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.flush_events = flush_events
+        self.shared = shared
+        self.data = self._empty()
+        self.versions = {part: 0 for part in COUNTER_KEYS + (SEARCHES_KEY, "users", "series")} # Bumped as each part changes
+        self._leaders = {key: [] for key in COUNTER_KEYS} # Top keys per counter, highest count first
+        self.series = TimeSeries(SERIES_METRICS)
+        self.search_capacity = search_capacity
+        self.searches = SpaceSaving(search_capacity)
+        self._dirty = 0 # Number of events not yet written to the database
+        self._deltas = self._empty_deltas() # Counts not yet added to the database
+        self._search_deltas = defaultdict(int) # Searches not yet added to the database
+        self._new_users = [] # Chat IDs added since the last flush
+        self._counter_versions = {} # Stores counter: its database version as of the last pull
+        self._lock = threading.Lock() # Guards data, series, searches, _dirty, the deltas and _new_users
+        self._flush_lock = threading.Lock() # Serializes database writes
+        self._wake = threading.Event()
+        self._flusher = None
+
+    @staticmethod
+    def _empty():
+        data = {
+            "total_users": 0,
+            "unique_users": set(), # Set of int chat_ids (shared: only those seen by this process)
+        }
+        for key in COUNTER_KEYS:
+            data[key] = defaultdict(int)
+        return data
+
+    @staticmethod
+    def _empty_deltas():
+        return {key: defaultdict(int) for key in COUNTER_KEYS}
+
+    def load(self):
+        """Loads analytics totals from the database."""
+        try:
+            with self._lock:
+                self._migrate_search_counts()
+                self._pull()
+            print(f"Successfully loaded analytics data.")
+        except sqlite3.Error as e:
+            print(f"Error loading analytics data: {e}. Starting with empty analytics.")
+            self.data = self._empty()
+            self._counter_versions = {}
+
+    def _migrate_search_counts(self):
+        # Caller holds self._lock; earlier versions (and the JSON import) kept every search
+        # query as a plain counter, so fold those into the summary once and drop them
+        legacy = self.store.get_counts(SEARCHES_KEY)
+        if not legacy:
+            return
+        sketch = SpaceSaving.from_rows(self.search_capacity, *self.store.load_sketch(SEARCHES_KEY))
+        for query, count in sorted(legacy.items(), key=lambda item: item[1], reverse=True):
+            sketch.offer(query, count)
+        with self.store.transaction():
+            self.store.save_sketch(SEARCHES_KEY, sketch.total, sketch.rows())
+            self.store.delete_counts(SEARCHES_KEY)
+        print(f"Folded {len(legacy)} search counters into the top searches summary.")
+
+    def _pull(self):
+        # Caller holds self._lock; replaces local totals with the database's, plus unflushed deltas
+        versions = self.store.counter_versions()
+        for key in COUNTER_KEYS:
+            if key in self._counter_versions and versions.get(key, 0) == self._counter_versions[key]:
+                continue # Nobody else wrote it, so local totals already match
+            self._counter_versions[key] = versions.get(key, 0)
+            totals = defaultdict(int, self.store.get_counts(key))
+            for item, amount in self._deltas[key].items():
+                totals[item] += amount
+            self.data[key] = totals
+            self._leaders[key] = heapq.nlargest(LEADERS_SIZE, totals, key=totals.get)
+            self.versions[key] += 1
+        if self.shared:
+            total_users = self.store.user_count() + len(self._new_users)
+        else:
+            self.data["unique_users"].update(self.store.user_ids()) # Only pulled on load
+            total_users = len(self.data["unique_users"])
+        if total_users != self.data["total_users"]:
+            self.data["total_users"] = total_users
+            self.versions["users"] += 1
+        sketch = SpaceSaving.from_rows(self.search_capacity, *self.store.load_sketch(SEARCHES_KEY))
+        for query, amount in self._search_deltas.items():
+            sketch.offer(query, amount)
+        self.searches = sketch
+        for resolution in self.series.resolutions:
+            self.series.load(resolution, self.store.get_series(resolution, self.series.oldest_bucket(resolution)))
+        self.versions[SEARCHES_KEY] += 1
+        self.versions["series"] += 1
+
+    def start(self):
+        """Starts the background flusher and registers a final flush at shutdown."""
+        if self._flusher is not None:
+            return
+        self._flusher = threading.Thread(target=self._run, name="analytics-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _mark_dirty(self, part):
+        # Caller holds self._lock; part (a counter, SEARCHES_KEY or "users") just changed, as did the series
+        self.versions[part] += 1
+        self.versions["series"] += 1
+        self._dirty += 1
+        if self._dirty >= self.flush_events:
+            self._wake.set()
+
+    def flush(self):
+        """
+        Adds pending analytics to the database if anything changed since the last flush.
+        Returns True if a write happened.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return False
+                pending = self._dirty
+                deltas, self._deltas = self._deltas, self._empty_deltas()
+                series_deltas = self.series.take_pending()
+                search_deltas, self._search_deltas = self._search_deltas, defaultdict(int)
+                search_snapshot = (self.searches.total, self.searches.rows()) if search_deltas else None
+                new_users = self._new_users
+                self._dirty = 0
+                self._new_users = []
+            try:
+                with self.store.transaction():
+                    for key in COUNTER_KEYS:
+                        self.store.add_counts(key, deltas[key])
+                    self.store.add_users(new_users)
+                    self.store.add_series(series_deltas)
+                    for resolution in self.series.resolutions:
+                        self.store.prune_series(resolution, self.series.oldest_bucket(resolution))
+                    if search_deltas and self.shared:
+                        # Other processes update the same summary, so merge this one's searches into it
+                        sketch = SpaceSaving.from_rows(self.search_capacity, *self.store.load_sketch(SEARCHES_KEY))
+                        for query, amount in search_deltas.items():
+                            sketch.offer(query, amount)
+                        self.store.save_sketch(SEARCHES_KEY, sketch.total, sketch.rows())
+                    elif search_deltas:
+                        self.store.save_sketch(SEARCHES_KEY, *search_snapshot)
+            except sqlite3.Error as e:
+                print(f"Error saving analytics data: {e}")
+                with self._lock:
+                    self._dirty += pending # Retry on the next flush
+                    self._new_users[:0] = new_users
+                    self.series.restore_pending(series_deltas)
+                    for query, amount in search_deltas.items():
+                        self._search_deltas[query] += amount
+                    for key in COUNTER_KEYS:
+                        for item, amount in deltas[key].items():
+                            self._deltas[key][item] += amount
+                return False
+            if self.shared:
+                with self._lock:
+                    for key in COUNTER_KEYS:
+                        if deltas[key] and key in self._counter_versions:
+                            self._counter_versions[key] += 1 # This flush's own write
+                    self._pull()
+        print("Analytics data saved.")
+        return True
+
+    # --- Tracking ---
+    def track_user(self, chat_id):
+        chat_id = int(chat_id)
+        if chat_id in self.data["unique_users"]: # Fast path for returning users, no lock needed
+            return
+        known = self.shared and self._known_user(chat_id)
+        with self._lock:
+            if chat_id not in self.data["unique_users"]:
+                self.data["unique_users"].add(chat_id)
+                if known:
+                    return # Another process (or an earlier run) already counted them
+                self._new_users.append(chat_id)
+                self.data["total_users"] += 1
+                self.series.add("new_users")
+                self._mark_dirty("users")
+
+    def _known_user(self, chat_id):
+        # Shared mode: whether the database already has a user this process hasn't seen
+        try:
+            return self.store.has_user(chat_id)
+        except sqlite3.Error as e:
+            print(f"Error looking up user {chat_id}: {e}")
+            return False
+
+    def increment(self, counter, key):
+        """Adds one to `key` in one of the COUNTER_KEYS counters."""
+        with self._lock:
+            self.data[counter][key] += 1
+            self._deltas[counter][key] += 1
+            self._promote(counter, key)
+            self.series.add(counter)
+            self._mark_dirty(counter)
+
+    def _promote(self, counter, key):
+        # Caller holds self._lock; key's count just went up by one. Counts only grow, so a key
+        # outside the leaders can at most pass the last one; bubble it up to its place
+        counts = self.data[counter]
+        leaders = self._leaders[counter]
+        if key in leaders:
+            i = leaders.index(key)
+        elif len(leaders) < LEADERS_SIZE:
+            leaders.append(key)
+            i = len(leaders) - 1
+        elif counts[key] > counts[leaders[-1]]:
+            leaders[-1] = key
+            i = len(leaders) - 1
+        else:
+            return
+        while i > 0 and counts[leaders[i - 1]] < counts[key]:
+            leaders[i - 1], leaders[i] = leaders[i], leaders[i - 1]
+            i -= 1
+
+    def top(self, counter, k=None):
+        """
+        Returns the k highest (key, count) pairs of a counter, highest first; all of them if k is None.
+        Up to LEADERS_SIZE entries come straight from the maintained leaders.
+        """
+        with self._lock:
+            counts = self.data[counter]
+            if k is not None and k <= LEADERS_SIZE:
+                return [(key, counts[key]) for key in self._leaders[counter][:k]]
+            return sorted(counts.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def track_search(self, query):
+        """Counts one search for query in the top searches summary."""
+        with self._lock:
+            self.searches.offer(query)
+            self._search_deltas[query] += 1
+            self.series.add(SEARCHES_KEY)
+            self._mark_dirty(SEARCHES_KEY)
+
+    def top_searches(self, k):
+        """
+        Returns (top, max_error): the k most searched queries as (query, count, error) tuples,
+        and the most any count may be over by.
+        """
+        with self._lock:
+            return self.searches.top(k), self.searches.max_error()
+
+    # --- Trends ---
+    def trend_totals(self, resolution, buckets):
+        """Returns {metric: count} over the last `buckets` buckets of a series resolution."""
+        with self._lock:
+            return self.series.totals(resolution, buckets)
+
+    def trend_history(self, resolution, buckets):
+        """Returns [(bucket start timestamp, events)] for the last `buckets` buckets, oldest first."""
+        with self._lock:
+            return self.series.history(resolution, buckets)
@@ -0,0 +1,122 @@
+import time
+
+REPORT_TOP_K = 5 # Entries shown for searches, game views and game shares
+
+class AnalyticsReport:
+    """
+    Renders the admin analytics report and caches it per dialect, section by section.
+    Each section is rebuilt only when its part of the analytics changes
+    (AnalyticsStore.versions) or, for game titles, when the catalogue is reloaded; the
+    trends section also expires as the minute rolls over. Opening the report therefore
+    only re-renders what changed since last time, usually just the commands list
+    (which counts the /analytics command itself) and the trends.
+    `message(dialect, key, **kwargs)` formats message strings; `title_for_url(url)` names games.
+    """
+
+    def __init__(self, analytics, message, title_for_url):
+        self.analytics = analytics
+        self.message = message
+        self.title_for_url = title_for_url
+        self._cache = {} # Stores (dialect, section): (cache key, section text)
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, dialect, catalogue_version):
+        """Returns the report text for dialect, rebuilding only the sections that changed."""
+        msg = lambda key, **kwargs: self.message(dialect, key, **kwargs)
+        versions = self.analytics.versions
+        sections = (
+            ("users", versions["users"], self._users),
+            ("commands_used", versions["commands_used"], self._commands),
+            ("top_searches", versions["top_searches"], self._searches),
+            ("game_details_views", (versions["game_details_views"], catalogue_version), self._views),
+            ("game_shares", (versions["game_shares"], catalogue_version), self._shares),
+            ("feedback_types", versions["feedback_types"], self._feedback),
+            ("trends", (versions["series"], int(time.time() // 60)), self._trends),
+        )
+        report = msg("admin_analytics_report_intro")
+        for section, key, build in sections:
+            # Read the version before building: events arriving mid-build leave the copy stale, not wrong
+            cached = self._cache.get((dialect, section))
+            if cached is not None and cached[0] == key:
+                self.hits += 1
+            else:
+                self.misses += 1
+                cached = self._cache[(dialect, section)] = (key, build(msg))
+            report += cached[1]
+        return report
+
+    def _users(self, msg):
+        return msg("admin_analytics_total_users", total_users=self.analytics.data['total_users'])
+
+    def _commands(self, msg):
+        text = msg("admin_analytics_commands_used_intro")
+        commands = self.analytics.top("commands_used")
+        for cmd, count in commands:
+            text += msg("admin_analytics_commands_used_item", cmd=cmd, count=count)
+        if not commands:
+            text += msg("admin_analytics_commands_used_none")
+        return text + "\n"
+
+    def _searches(self, msg):
+        text = msg("admin_analytics_top_searches_intro")
+        top_searches, max_error = self.analytics.top_searches(REPORT_TOP_K)
+        for query, count, error in top_searches:
+            item = "admin_analytics_top_searches_approx_item" if error else "admin_analytics_top_searches_item"
+            text += msg(item, query=query, count=count, error=error)
+        if not top_searches:
+            text += msg("admin_analytics_top_searches_none")
+        elif max_error:
+            text += msg("admin_analytics_top_searches_error", max_error=max_error)
+        return text + "\n"
+
+    def _views(self, msg):
+        text = msg("admin_analytics_game_views_intro")
+        views = self.analytics.top("game_details_views", REPORT_TOP_K)
+        for url, count in views:
+            text += msg("admin_analytics_game_views_item", game_title=self.title_for_url(url), count=count)
+        if not views:
+            text += msg("admin_analytics_game_views_none")
+        return text + "\n"
+
+    def _shares(self, msg):
+        text = msg("admin_analytics_game_shares_intro")
+        shares = self.analytics.top("game_shares", REPORT_TOP_K)
+        for url, count in shares:
+            text += msg("admin_analytics_game_shares_item", game_title=self.title_for_url(url), count=count)
+        if not shares:
+            text += msg("admin_analytics_game_shares_none")
+        return text + "\n"
+
+    def _feedback(self, msg):
+        text = msg("admin_analytics_feedback_intro")
+        feedback = self.analytics.top("feedback_types")
+        for f_type, count in feedback:
+            text += msg("admin_analytics_feedback_item", f_type=f_type, count=count)
+        if not feedback:
+            text += msg("admin_analytics_feedback_none")
+        return text + "\n"
+
+    def _trends(self, msg):
+        # Recent activity windows, the busiest hour and a daily sparkline
+        trends = msg("admin_analytics_trends_intro")
+        for window, resolution, buckets in (("last_hour", "minute", 60), ("last_day", "hour", 24), ("last_week", "hour", 24 * 7)):
+            totals = self.analytics.trend_totals(resolution, buckets)
+            trends += msg("admin_analytics_trends_window",
+                          window=msg(f"admin_analytics_trends_{window}"),
+                          commands=totals["commands_used"], searches=totals["top_searches"],
+                          views=totals["game_details_views"], new_users=totals["new_users"])
+        peak_start, peak_count = max(self.analytics.trend_history("hour", 24), key=lambda bucket: bucket[1])
+        if peak_count:
+            trends += msg("admin_analytics_trends_peak",
+                          hour=time.strftime("%a %H:00", time.gmtime(peak_start)), count=peak_count)
+        daily = [count for _, count in self.analytics.trend_history("day", 7)]
+        trends += msg("admin_analytics_trends_daily", sparkline=sparkline(daily))
+        return trends
+
+def sparkline(values):
+    """Renders counts as a row of block characters scaled to the largest one."""
+    blocks = "▁▂▃▄▅▆▇█"
+    top = max(values) or 1
+    return "".join(blocks[value * (len(blocks) - 1) // top] for value in values)
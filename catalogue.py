@@ -0,0 +1,180 @@
+import json
+import random
+import hashlib
+from array import array
+from collections import OrderedDict
+from math import gcd
+
+from search_index import TitleIndex
+
+RANDOM_SAMPLER_MAX_CHATS = 10000 # Oldest per-chat random cursors are dropped beyond this
+FULL_REBUILD_FRACTION = 0.25 # updated() rebuilds from scratch once this share of games changed
+
+def content_version(games):
+    """
+    Returns a version string derived from the games' content. Every process holding the
+    same game list gets the same version, and different lists different ones, so it can
+    be stored in state shared between processes.
+    """
+    encoded = json.dumps(games, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()
+    return hashlib.blake2b(encoded, digest_size=12).hexdigest()
+
+class GameCatalogue:
+    """
+    Read-only view over the loaded game list, built once per load.
+    Holds the URL lookup, the title search index and the newest-first ordering,
+    and hands out random games without repeats per chat.
+    `version` identifies the game list (see content_version), so state built from search
+    results (which refers to games by position) can tell when it's stale, even in another
+    process.
+    """
+
+    def __init__(self, games, version=None, _title_index=None, _by_url=None, _latest=None):
+        self.games = games
+        self.version = version if version is not None else content_version(games)
+        if _by_url is None:
+            _by_url = {}
+            for game in games:
+                _by_url.setdefault(game["url"], game) # First entry wins, as a linear scan would
+        self._by_url = _by_url
+        self._title_index = _title_index if _title_index is not None else TitleIndex(games)
+        if _latest is None:
+            # Stable sort, so games sharing a modified date keep their catalogue order
+            _latest = array('I', sorted(range(len(games)), key=lambda i: games[i]["modified"], reverse=True))
+        self._latest = _latest # Positions in games, newest first
+        self._random_cursors = OrderedDict() # Stores chat_id: [offset, step, position]
+
+    def __len__(self):
+        return len(self.games)
+
+    def updated(self, games):
+        """
+        Returns (catalogue, diff) for a freshly fetched game list. Games are matched by url;
+        one whose `modified` (and content) is unchanged keeps its existing game object and
+        index entries, so only added and changed games are indexed anew.
+        diff maps "added", "changed" and "removed" to lists of URLs. If nothing changed,
+        the catalogue returned is this one, with its version (and caches keyed on it) intact.
+        """
+        old_by_position = {}
+        for j, game in enumerate(self.games):
+            old_by_position.setdefault(game["url"], j)
+        new_games = []
+        old_positions = []
+        diff = {"added": [], "changed": [], "removed": []}
+        for game in games:
+            j = old_by_position.pop(game["url"], -1) # Pop, so each old game is reused at most once
+            if j < 0:
+                diff["added"].append(game["url"])
+            elif self.games[j]["modified"] != game["modified"] or self.games[j] != game:
+                diff["changed"].append(game["url"])
+                j = -1
+            new_games.append(self.games[j] if j >= 0 else game)
+            old_positions.append(j)
+        diff["removed"] = list(old_by_position)
+
+        if not any(diff.values()) and old_positions == list(range(len(self.games))):
+            return self, diff
+        if sum(map(len, diff.values())) > len(games) * FULL_REBUILD_FRACTION:
+            return GameCatalogue(new_games), diff
+
+        by_url = dict(self._by_url)
+        for url in diff["removed"] + diff["changed"]:
+            del by_url[url]
+        remap = array('i', [-1]) * len(self.games) # Old position: new position, or -1 if dropped
+        fresh = [] # New positions of added and changed games
+        reordered = False
+        previous = -1
+        for i, j in enumerate(old_positions):
+            if j < 0:
+                fresh.append(i)
+                by_url.setdefault(new_games[i]["url"], new_games[i])
+            else:
+                remap[j] = i
+                reordered = reordered or j < previous
+                previous = j
+        latest = None
+        if not reordered:
+            # Surviving games keep their relative order, so their newest-first order holds
+            survivors = array('I', (remap[j] for j in self._latest if remap[j] >= 0))
+            latest = _merge_latest(new_games, survivors, fresh)
+        return GameCatalogue(new_games, _title_index=self._title_index.updated(new_games, old_positions),
+                             _by_url=by_url, _latest=latest), diff
+
+    def get(self, game_url):
+        """Returns the game with the given URL path, or None."""
+        return self._by_url.get(game_url)
+
+    def search(self, query):
+        """Returns games whose title contains query (case-insensitive), in catalogue order."""
+        return self._title_index.search(query)
+
+    def search_indices(self, query):
+        """Like search(), but returns positions in self.games as a shared, read-only array('I')."""
+        return self._title_index.search_indices(query)
+
+    def refine_indices(self, indices, query):
+        """Returns the positions among indices (from search_indices()) whose title contains query."""
+        return self._title_index.refine_indices(indices, query)
+
+    def games_at(self, indices):
+        """Returns the games at the given positions, skipping any past the end of the list."""
+        games = self.games
+        return [games[i] for i in indices if i < len(games)]
+
+    def latest(self, count):
+        """Returns the `count` most recently modified games, newest first."""
+        return self.games_at(self._latest[:count])
+
+    def random_game(self, chat_id=None):
+        """
+        Returns a random game, or None if the catalogue is empty.
+        For a given chat, every game is shown once before any repeats: each chat walks
+        its own random permutation (offset + position * step) mod N, with step coprime to N.
+        """
+        total = len(self.games)
+        if not total:
+            return None
+        if chat_id is None:
+            return random.choice(self.games)
+
+        cursor = self._random_cursors.get(chat_id)
+        if cursor is None or cursor[2] >= total:
+            step = random.randrange(1, total) if total > 1 else 1
+            while gcd(step, total) != 1:
+                step = random.randrange(1, total)
+            cursor = [random.randrange(total), step, 0]
+            self._random_cursors[chat_id] = cursor
+        self._random_cursors.move_to_end(chat_id)
+        if len(self._random_cursors) > RANDOM_SAMPLER_MAX_CHATS:
+            self._random_cursors.popitem(last=False)
+
+        offset, step, position = cursor
+        cursor[2] += 1
+        return self.games[(offset + position * step) % total]
+
+def _merge_latest(games, survivors, fresh):
+    """
+    Returns survivors (positions in games, newest first, ties in catalogue order) with the
+    positions in fresh merged in, in the same order. Each fresh game's place is found by
+    binary search, so only those games' dates are compared rather than re-sorting them all.
+    """
+    def before(i, k):
+        # True if the game at position i comes before the one at k in newest-first order
+        a, b = games[i]["modified"], games[k]["modified"]
+        return a > b or (a == b and i < k)
+
+    merged = array('I')
+    lo = 0
+    # Stable sort of ascending positions, so ties stay in catalogue order
+    for i in sorted(fresh, key=lambda i: games[i]["modified"], reverse=True):
+        start, hi = lo, len(survivors)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if before(survivors[mid], i):
+                lo = mid + 1
+            else:
+                hi = mid
+        merged.extend(survivors[start:lo])
+        merged.append(i)
+    merged.extend(survivors[lo:])
+    return merged
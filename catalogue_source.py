@@ -0,0 +1,176 @@
+import os
+import json
+import codecs
+import pickle
+import requests
+
+from storage import atomic_write_bytes
+
+STREAM_CHUNK_SIZE = 64 * 1024 # Bytes read from the response at a time
+SNAPSHOT_FORMAT = 1 # Bumped when the snapshot layout changes; other formats are ignored
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]" # Characters that can follow a complete array element
+REQUIRED_FIELDS = ("url", "title", "modified") # String fields GameCatalogue looks up, indexes and sorts by
+
+def iter_json_array(chunks):
+    """
+    Yields the elements of a top-level JSON array read from an iterable of byte chunks
+    (UTF-8), parsing each element as soon as it's complete. Only the current element is
+    ever buffered, so the raw document and the parsed list are never both in memory.
+    Raises ValueError if the document isn't a well-formed JSON array.
+    """
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer = ""
+    pos = 0
+    exhausted = False
+    started = False
+    after_element = False # An element was just parsed, so "," or "]" must come next
+    after_comma = False # A "," was just read, so an element must come next
+
+    def more():
+        # Appends the next chunk to the buffer; returns False at the end of the stream
+        nonlocal buffer, pos, exhausted
+        if exhausted:
+            return False
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            buffer = buffer[pos:] + text_decoder.decode(b"", final=True)
+        else:
+            buffer = buffer[pos:] + text_decoder.decode(chunk)
+        pos = 0
+        return True
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+        if pos == len(buffer):
+            if more():
+                continue
+            raise ValueError("Unexpected end of JSON array")
+        char = buffer[pos]
+        if not started:
+            if char != "[":
+                raise ValueError("Expected a JSON array")
+            started = True
+            pos += 1
+            continue
+        if char == "]":
+            if after_comma:
+                raise ValueError("Trailing comma in JSON array")
+            pos += 1
+            while True: # Only whitespace may follow the array
+                if buffer[pos:].strip(_WHITESPACE):
+                    raise ValueError("Extra data after JSON array")
+                pos = len(buffer)
+                if not more():
+                    return
+        if char == ",":
+            if not after_element:
+                raise ValueError("Unexpected comma in JSON array")
+            after_element, after_comma = False, True
+            pos += 1
+            continue
+        if after_element:
+            raise ValueError("Expected ',' or ']' between JSON array elements")
+        try:
+            element, end = _decoder.raw_decode(buffer, pos)
+        except ValueError:
+            if more():
+                continue # The element continues in the next chunk
+            raise
+        if not isinstance(element, (dict, list, str)) and \
+           (end == len(buffer) or buffer[end] not in _DELIMITERS) and more():
+            continue # A number may continue in the next chunk ("2" of "2.5")
+        pos = end
+        after_element, after_comma = True, False
+        yield element
+
+def check_games(games):
+    """Raises ValueError unless every game is an object with the REQUIRED_FIELDS as strings."""
+    for i, game in enumerate(games):
+        if not isinstance(game, dict):
+            raise ValueError(f"Game {i} is not an object")
+        for field in REQUIRED_FIELDS:
+            if not isinstance(game.get(field), str):
+                raise ValueError(f"Game {i} has no {field!r} string")
+
+class CatalogueSource:
+    """
+    Fetches the game list from `url` over a keep-alive session with timeouts.
+    Fetches are conditional (ETag / Last-Modified), so an unchanged index costs a 304,
+    and the body is parsed incrementally from the stream.
+    """
+
+    def __init__(self, url, connect_timeout=5.0, read_timeout=30.0):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        self.etag = None
+        self.last_modified = None
+
+    def fetch(self, conditional=True):
+        """
+        Returns the list of games, or None if the index hasn't changed since the last
+        successful fetch (only asked when `conditional` is set).
+        Raises requests.exceptions.RequestException or ValueError on failure, including a
+        game list that doesn't pass check_games().
+        """
+        headers = {}
+        if conditional:
+            if self.etag:
+                headers["If-None-Match"] = self.etag
+            if self.last_modified:
+                headers["If-Modified-Since"] = self.last_modified
+        with self.session.get(self.url, headers=headers, timeout=self.timeout, stream=True) as response:
+            if response.status_code == 304:
+                return None
+            response.raise_for_status()
+            games = list(iter_json_array(response.iter_content(chunk_size=STREAM_CHUNK_SIZE)))
+            check_games(games)
+            # Only remember the validators once the whole body has parsed and checked out
+            self.etag = response.headers.get("ETag")
+            self.last_modified = response.headers.get("Last-Modified")
+        return games
+
+    def forget_validators(self):
+        """Makes the next fetch unconditional, e.g. after a fetched list couldn't be used."""
+        self.etag = None
+        self.last_modified = None
+
+    # --- On-disk snapshot ---
+    def save_snapshot(self, path, games):
+        """
+        Pickles games, with the validators they were fetched under, to path (atomically).
+        Raises OSError on failure.
+        """
+        snapshot = {"format": SNAPSHOT_FORMAT, "etag": self.etag, "last_modified": self.last_modified, "games": games}
+        atomic_write_bytes(path, pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def load_snapshot(self, path):
+        """
+        Returns the games saved by save_snapshot(), or None if there's no usable snapshot.
+        Restores the validators too, so the next fetch is a 304 if the index hasn't changed.
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                snapshot = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError) as e:
+            print(f"Error reading catalogue snapshot {path}: {e}. Ignoring it.")
+            return None
+        if not isinstance(snapshot, dict) or snapshot.get("format") != SNAPSHOT_FORMAT:
+            print(f"Catalogue snapshot {path} has an unknown format. Ignoring it.")
+            return None
+        try:
+            check_games(snapshot["games"])
+        except ValueError as e:
+            print(f"Catalogue snapshot {path} is malformed: {e}. Ignoring it.")
+            return None
+        self.etag = snapshot["etag"]
+        self.last_modified = snapshot["last_modified"]
+        return snapshot["games"]
@@ -0,0 +1,88 @@
+GAME_PAGE_BASE_URL = "https://glitchify.space/"
+
+class GameRenderer:
+    """
+    Renders games into ready-to-send payload fragments (caption, page and thumbnail URLs,
+    details text, InputMediaPhoto, inline query result, per-dialect inline keyboard) and
+    caches them per game URL and dialect. Each entry remembers the game object it was
+    rendered from; GameCatalogue.updated() keeps that object for games that didn't
+    change, so after a reload only added and changed games are rendered again.
+    The fragments are shared between sends, so callers must not modify them.
+    `message(dialect, key)` formats the button labels.
+    """
+
+    def __init__(self, message):
+        self.message = message
+        self._games = {} # Stores game url: (game, fragments)
+        self._keyboards = {} # Stores (game url, dialect): (game, inline keyboard)
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, game):
+        """
+        Returns the dialect-independent fragments for game: "url", "thumb", "text"
+        (the photo caption), "details", "media" and "inline_result" (without its "id").
+        """
+        cached = self._games.get(game["url"])
+        if cached is not None and cached[0] is game:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        page_url = GAME_PAGE_BASE_URL + game['url'].lstrip('/')
+        thumb_url = page_url.rsplit('/', 1)[0] + "/screenshot1.jpg"
+        tags = ', '.join(game.get('tags', []))
+        caption = f"*{game['title']}*\n🏷️ `{tags}`\n🕒 `{game['modified']}`"
+        fragments = {
+            "url": page_url,
+            "thumb": thumb_url,
+            "text": caption,
+            "details": (
+                f"*{game['title']}*\n\n"
+                f"📝 *Description:*\n{game.get('description', 'No description available.')}\n\n"
+                f"🏷️ *Tags/Genre:* `{tags}`\n"
+                f"🕒 *Last Modified:* `{game['modified']}`\n"
+                f"🗓️ *Release Date:* `{game.get('release_date', 'N/A')}`"
+            ),
+            "media": {"type": "photo", "media": thumb_url, "caption": caption, "parse_mode": "Markdown"},
+            "inline_result": {
+                "type": "photo",
+                "photo_url": thumb_url,
+                "thumb_url": thumb_url,
+                "caption": caption,
+                "parse_mode": "Markdown",
+                "reply_markup": {"inline_keyboard": [ # Inline query buttons are always slang for consistency
+                    [{"text": self.message("slang", "inline_view_on_glitchify"), "url": page_url}],
+                    [{"text": self.message("slang", "inline_get_full_scoop"), "callback_data": f"details:{game['url']}"}]
+                ]}
+            },
+        }
+        self._games[game["url"]] = (game, fragments)
+        return fragments
+
+    def keyboard(self, game, dialect):
+        """Returns the view/details/share inline keyboard for game's photo in dialect."""
+        key = (game["url"], dialect)
+        cached = self._keyboards.get(key)
+        if cached is not None and cached[0] is game:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        keyboard = {
+            "inline_keyboard": [
+                [{"text": self.message(dialect, "inline_view_on_glitchify"), "url": self.render(game)["url"]}],
+                [{"text": self.message(dialect, "inline_get_full_scoop"), "callback_data": f"details:{game['url']}"}],
+                [{"text": self.message(dialect, "inline_share_game"), "callback_data": f"share_game:{game['url']}"}]
+            ]
+        }
+        self._keyboards[key] = (game, keyboard)
+        return keyboard
+
+    def retain(self, catalogue):
+        """Drops entries for games that were removed from or changed in catalogue."""
+        for url, (game, _) in list(self._games.items()):
+            if catalogue.get(url) is not game:
+                self._games.pop(url, None)
+        for key, (game, _) in list(self._keyboards.items()):
+            if catalogue.get(key[0]) is not game:
+                self._keyboards.pop(key, None)
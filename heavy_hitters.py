@@ -0,0 +1,72 @@
+import heapq
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitters summary (Metwally et al.): approximate counts for the most
+    frequent keys of a stream, using at most `capacity` counters whatever the number of
+    distinct keys. A tracked key's count overestimates its true count by at most its
+    error, and every key seen more than total / capacity times is guaranteed tracked.
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.total = 0 # Sum of every amount offered
+        self._counts = {} # Stores key: [count, error]
+        self._heap = [] # (count, key) min-heap over _counts; entries go stale as counts grow
+
+    @classmethod
+    def from_rows(cls, capacity, total, rows):
+        """Rebuilds a summary from rows() output (e.g. read back from the database)."""
+        sketch = cls(capacity)
+        sketch.total = total
+        for key, count, error in sorted(rows, key=lambda row: row[1], reverse=True)[:capacity]:
+            sketch._counts[key] = [count, error]
+        sketch._rebuild_heap()
+        return sketch
+
+    def __len__(self):
+        return len(self._counts)
+
+    def _rebuild_heap(self):
+        self._heap = [(entry[0], key) for key, entry in self._counts.items()]
+        heapq.heapify(self._heap)
+
+    def _pop_min(self):
+        # Returns (count, key) of the smallest live counter, skipping stale heap entries
+        while True:
+            count, key = heapq.heappop(self._heap)
+            entry = self._counts.get(key)
+            if entry is not None and entry[0] == count:
+                return count, key
+
+    def offer(self, key, amount=1):
+        """Counts `amount` occurrences of key."""
+        self.total += amount
+        entry = self._counts.get(key)
+        if entry is not None:
+            entry[0] += amount
+        elif len(self._counts) < self.capacity:
+            entry = self._counts[key] = [amount, 0]
+        else:
+            # Replace the smallest counter; the newcomer inherits its count as error
+            min_count, min_key = self._pop_min()
+            del self._counts[min_key]
+            entry = self._counts[key] = [min_count + amount, min_count]
+        heapq.heappush(self._heap, (entry[0], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild_heap() # Drop stale entries so the heap stays bounded too
+
+    def top(self, k):
+        """Returns the k keys with the highest counts as (key, count, error) tuples, highest first."""
+        best = heapq.nlargest(k, self._counts.items(), key=lambda item: item[1][0])
+        return [(key, count, error) for key, (count, error) in best]
+
+    def max_error(self):
+        """Largest amount any count may be over by; also the most an untracked key can have been seen."""
+        if len(self._counts) < self.capacity:
+            return 0 # Nothing was ever evicted, so every count is exact
+        return min(entry[0] for entry in self._counts.values())
+
+    def rows(self):
+        """Returns every counter as (key, count, error) tuples."""
+        return [(key, count, error) for key, (count, error) in self._counts.items()]
@@ -0,0 +1,98 @@
+import threading
+from collections import OrderedDict
+
+from search_index import NGRAM_SIZE
+
+INLINE_PAGE_SIZE = 50 # Telegram accepts at most 50 results per answer
+INLINE_MAX_USERS = 10000 # Oldest users' latest-query records are dropped beyond this
+
+class InlineSearch:
+    """
+    Search results for inline queries, cached per catalogue version and normalized query
+    (trimmed, lower-cased) in an LRU of `capacity` result sets, and paged with Telegram's
+    offsets. A query that extends a cached one (the user typed another character) is
+    answered by narrowing the cached result set instead of searching the whole catalogue.
+    It also remembers each user's latest query, so answers to queries the user has
+    already typed past can be skipped. Thread-safe.
+    """
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self._results = OrderedDict() # Stores (catalogue version, query): array('I') of positions
+        self._latest = OrderedDict() # Stores user_id: latest inline_query_id
+        self._lock = threading.Lock()
+        # Metrics
+        self.hits = 0
+        self.refined = 0 # Misses answered from a cached shorter query
+        self.misses = 0
+        self.skipped = 0 # Superseded queries never answered
+
+    @staticmethod
+    def normalize(query):
+        return query.strip().lower()
+
+    def received(self, user_id, inline_query_id):
+        """Records inline_query_id as user_id's latest query."""
+        if user_id is None:
+            return
+        with self._lock:
+            self._latest[user_id] = inline_query_id
+            self._latest.move_to_end(user_id)
+            if len(self._latest) > INLINE_MAX_USERS:
+                self._latest.popitem(last=False)
+
+    def is_superseded(self, user_id, inline_query_id):
+        """Returns True (and counts it) if user_id has sent a newer query than inline_query_id."""
+        if user_id is None:
+            return False
+        with self._lock:
+            latest = self._latest.get(user_id)
+            if latest is None or latest == inline_query_id:
+                return False
+            self.skipped += 1
+            return True
+
+    def search(self, catalogue, query):
+        """Returns the positions in catalogue.games matching query, as a shared, read-only array('I')."""
+        query = self.normalize(query)
+        key = (catalogue.version, query)
+        with self._lock:
+            indices = self._results.get(key)
+            if indices is not None:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return indices
+            # Longest cached prefix; shorter queries are looked up in the index directly
+            base = None
+            for end in range(len(query) - 1, NGRAM_SIZE - 1, -1):
+                base = self._results.get((catalogue.version, query[:end]))
+                if base is not None:
+                    break
+        if base is not None:
+            indices = catalogue.refine_indices(base, query)
+        else:
+            indices = catalogue.search_indices(query)
+        with self._lock:
+            if base is not None:
+                self.refined += 1
+            else:
+                self.misses += 1
+            self._results[key] = indices
+            self._results.move_to_end(key)
+            while len(self._results) > self.capacity:
+                self._results.popitem(last=False)
+        return indices
+
+    def page(self, catalogue, query, offset):
+        """
+        Returns (games, start, next_offset) for the page of query's results starting at
+        offset (Telegram's offset string; empty for the first page). start is the first
+        game's position in the results, and next_offset is "" on the last page.
+        """
+        try:
+            start = max(0, int(offset or 0))
+        except ValueError:
+            start = 0
+        indices = self.search(catalogue, query)
+        end = start + INLINE_PAGE_SIZE
+        return catalogue.games_at(indices[start:end]), start, (str(end) if end < len(indices) else "")
@@ -1,26 +1,72 @@
 import os
-import json
-import random
+import queue
+import threading
 import requests
 from flask import Flask, request
-from collections import defaultdict # For easier counting
+from catalogue import GameCatalogue
+from catalogue_source import CatalogueSource
+from analytics import AnalyticsStore
+from analytics_report import AnalyticsReport
+from game_render import GameRenderer
+from message_catalogue import MessageCatalogue
+from router import Router
+from inline_search import InlineSearch
+from telegram_client import TelegramClient
+from outbound import OutboundQueue
+from rate_limit import RateLimiter, PRIORITY_BACKGROUND
+from sqlite_store import SQLiteStore
+from state_backend import LocalBackend, SQLiteBackend
 
 app = Flask(__name__)
 
 BOT_TOKEN = os.environ.get("BOT_TOKEN")
-ADMIN_ID = os.environ.get("ADMIN_ID")  # Telegram ID of admin (as a string)
-BASE_URL = f"https://api.telegram.org/bot{BOT_TOKEN}"
+ADMIN_ID = int(os.environ["ADMIN_ID"]) if os.environ.get("ADMIN_ID") else None  # Telegram chat ID of admin (an int, like every other chat_id)
+TELEGRAM_CONNECT_TIMEOUT = float(os.environ.get("TELEGRAM_CONNECT_TIMEOUT", 5)) # Seconds to open a Bot API connection
+TELEGRAM_READ_TIMEOUT = float(os.environ.get("TELEGRAM_READ_TIMEOUT", 15)) # Seconds to wait for a Bot API response
+OUTBOUND_WORKERS = int(os.environ.get("OUTBOUND_WORKERS", 8)) # Background threads delivering Bot API calls
+TELEGRAM_GLOBAL_RATE = float(os.environ.get("TELEGRAM_GLOBAL_RATE", 30)) # Messages per second across all chats
+TELEGRAM_CHAT_RATE = float(os.environ.get("TELEGRAM_CHAT_RATE", 1)) # Sustained messages per second into one chat
+TELEGRAM_CHAT_BURST = int(os.environ.get("TELEGRAM_CHAT_BURST", 3)) # Messages one chat may receive back to back
 DATA_URL = "https://glitchify.space/search-index.json"
-ANALYTICS_FILE = "analytics_data.json" # File to store analytics data
-DIALECTS_FILE = "user_dialects.json" # New: File to store user dialect preferences
+DATA_CONNECT_TIMEOUT = float(os.environ.get("DATA_CONNECT_TIMEOUT", 5)) # Seconds to connect to DATA_URL
+DATA_READ_TIMEOUT = float(os.environ.get("DATA_READ_TIMEOUT", 30)) # Seconds to wait for each read from DATA_URL
+CATALOGUE_SNAPSHOT_FILE = os.environ.get("CATALOGUE_SNAPSHOT_FILE", "catalogue_snapshot.pickle") # Last fetched games, for fast cold starts
+CATALOGUE_REFRESH_INTERVAL = float(os.environ.get("CATALOGUE_REFRESH_INTERVAL", 15 * 60)) # Seconds between background refreshes (0: only on /reload_data)
+STATE_DB_PATH = os.environ.get("STATE_DB_PATH", "bot_state.db") # SQLite database for analytics, dialects and (shared) flows
+ANALYTICS_FILE = "analytics_data.json" # Old analytics file, imported into the database once
+ANALYTICS_USERS_FILE = "analytics_users.bin" # Old append-only int64 unique users file, imported into the database once
+ANALYTICS_FLUSH_INTERVAL = float(os.environ.get("ANALYTICS_FLUSH_INTERVAL", 30)) # Seconds between analytics database writes
+ANALYTICS_FLUSH_EVENTS = int(os.environ.get("ANALYTICS_FLUSH_EVENTS", 50)) # Write early once this many events are pending
+ANALYTICS_TOP_SEARCHES = int(os.environ.get("ANALYTICS_TOP_SEARCHES", 1000)) # Distinct search queries counted (approximate top-K)
+DIALECTS_FILE = "user_dialects.json" # Old user dialect preferences file, imported into the database once
+INLINE_CACHE_TIME = int(os.environ.get("INLINE_CACHE_TIME", 300)) # Seconds Telegram may cache an inline query's answer
+INLINE_RESULTS_CACHE_SIZE = int(os.environ.get("INLINE_RESULTS_CACHE_SIZE", 1024)) # Inline query result sets kept in memory
+STATE_BACKEND = os.environ.get("STATE_BACKEND", "memory").lower() # "memory" (single process) or "sqlite" (shared by all workers; see SQLiteBackend for what isn't shared)
+STATE_MAX_ENTRIES = int(os.environ.get("STATE_MAX_ENTRIES", 10000)) # Chats with an open flow kept in memory
 
 # Global variables
-_games_data = []
-_analytics_data = {} # Stores bot usage analytics
-_user_dialects = {} # New: Stores user dialect preferences: {chat_id: "slang" | "formal"}
+rate_limiter = RateLimiter(TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE, TELEGRAM_CHAT_BURST) # Flood-limit pacing for sends
+telegram = TelegramClient(BOT_TOKEN, TELEGRAM_CONNECT_TIMEOUT, TELEGRAM_READ_TIMEOUT, limiter=rate_limiter) # Pooled Bot API client
+outbox = OutboundQueue(telegram, OUTBOUND_WORKERS, limiter=rate_limiter) # Per-chat ordered background delivery for webhook replies
+_catalogue = GameCatalogue([]) # Loaded games plus their lookup, search and ordering views (read-only, loaded per process)
+_catalogue_source = CatalogueSource(DATA_URL, DATA_CONNECT_TIMEOUT, DATA_READ_TIMEOUT) # Conditional, streaming fetches of DATA_URL
+_catalogue_lock = threading.Lock() # Serializes catalogue loads; readers never take it
+_refresh_requests = queue.Queue() # (chat_id, reply_to_message_id) waiting on a requested refresh
+_catalogue_diff = {"added": [], "changed": [], "removed": []} # Game URLs added/changed/removed by the last load
+_inline_search = InlineSearch(INLINE_RESULTS_CACHE_SIZE) # Cached, paged inline query results
+_db = SQLiteStore(STATE_DB_PATH) # Persistent analytics counters, users and dialect preferences
+if STATE_BACKEND == "sqlite":
+    _state = SQLiteBackend(_db) # Flows and dialects shared across worker processes
+else:
+    _state = LocalBackend(_db, STATE_MAX_ENTRIES) # Flows and dialects held in this process
+_analytics = AnalyticsStore(_db, ANALYTICS_FLUSH_INTERVAL, ANALYTICS_FLUSH_EVENTS, shared=_state.shared, search_capacity=ANALYTICS_TOP_SEARCHES) # Stores bot usage analytics
 
 # --- Configuration ---
 GAMES_PER_PAGE = 3 # Define how many games to show per page for search results
+LATEST_GAMES_COUNT = 3 # How many games /latest sends
+SEARCH_RESULTS_AS_ALBUM = os.environ.get("SEARCH_RESULTS_AS_ALBUM", "").lower() in ("1", "true", "yes") # Send result pages as one sendMediaGroup album
+STATE_SWEEP_INTERVAL = float(os.environ.get("STATE_SWEEP_INTERVAL", 60)) # Seconds between expired-flow sweeps
+PAGINATION_EDIT_IN_PLACE = os.environ.get("PAGINATION_EDIT_IN_PLACE", "").lower() in ("1", "true", "yes") # Page flips edit the shown messages instead of resending
 
 # --- Message Dictionary (New) ---
 MESSAGES = {
@@ -63,8 +109,11 @@ MESSAGES = {
         "admin_status_games_loaded": "🎮 Game data loaded: {num_games} games. We got the whole stash!",
         "admin_status_games_not_loaded": "❌ Game data not loaded. Check the server logs, fam. Something's off.",
         "admin_status_analytics_loaded": "📊 Analytics on point. Total unique users: {total_users}. Peep the growth!📈",
+        "admin_status_outbound": "📮 Outbox: {queued} queued, {waiting} waitin' on flood limits, {delayed} delayed (avg {avg_delay:.2f}s), {throttled} 429s from Telegram.",
+        "admin_status_flows": "🧵 Convos: {live} open ({breakdown}), {expired} ghosted, {evicted} kicked for space.",
         "admin_reload_prompt": "🔄 Reloading game data, hold up... This might take a sec. ⏳",
         "admin_reload_success": "✅ Game data reloaded, we good! Fresh data incoming! ✨",
+        "admin_reload_diff": "📦 {added} new, {changed} updated, {removed} dropped.",
         "admin_reload_fail": "❌ Nah, couldn't reload game data. Check the server logs, fam. Something's buggin'. 🐛",
         "admin_analytics_report_intro": "📊 *Bot Usage Analytics - Peep the Stats, Boss!* 😎\n\n",
         "admin_analytics_total_users": "👥 *Total Unique Users:* {total_users} (Growing the squad!)\n\n",
@@ -74,6 +123,8 @@ MESSAGES = {
         "admin_analytics_top_searches_intro": "*Top Searches:*\n",
         "admin_analytics_top_searches_item": "  `{query}`: {count} hits\n",
         "admin_analytics_top_searches_none": "  _No searches yet. Get to typing! ⌨️_\n",
+        "admin_analytics_top_searches_approx_item": "  `{query}`: ~{count} hits (±{error})\n",
+        "admin_analytics_top_searches_error": "  _Counts might be up to {max_error} too high. Keepin' it real._\n",
         "admin_analytics_game_views_intro": "*Game Details Views:*\n",
         "admin_analytics_game_views_item": "  `{game_title}`: {count} peeks\n",
         "admin_analytics_game_views_none": "  _No game details viewed yet. What's good? 🤔_\n",
@@ -83,6 +134,13 @@ MESSAGES = {
         "admin_analytics_feedback_intro": "*Feedback Types:*\n",
         "admin_analytics_feedback_item": "  `{f_type}`: {count} received\n",
         "admin_analytics_feedback_none": "  _No feedback received yet. Don't be shy! 🤫_\n",
+        "admin_analytics_trends_intro": "*Activity Trends - Who's Been Pullin' Up:*\n",
+        "admin_analytics_trends_window": "  {window}: {commands} commands, {searches} searches, {views} peeks, {new_users} new gamers\n",
+        "admin_analytics_trends_last_hour": "Last hour",
+        "admin_analytics_trends_last_day": "Last 24h",
+        "admin_analytics_trends_last_week": "Last 7 days",
+        "admin_analytics_trends_peak": "  Busiest hour (24h): {hour} UTC with {count} events 🔥\n",
+        "admin_analytics_trends_daily": "  Daily (7 days): `{sparkline}`\n",
         "admin_unknown_cmd": "Unknown admin command, fam. What's that even mean? 🧐",
         "admin_unauthorized": "🚫 Nah, you ain't authorized to use admin commands. Stay in your lane, fam. 🙅‍♂️",
         "admin_menu_prompt": "⚙️ *Admin Panel:*\nWhat's the move, boss? 👇",
@@ -107,6 +165,8 @@ MESSAGES = {
         "pagination_previous": "⬅️ Previous Page",
         "pagination_next": "Next Page ➡️",
         "pagination_view_all": "🔍 See All on Glitchify",
+        "album_game_details": "✨ {position}. {title}",
+        "album_game_share": "📤 Flex #{position}",
         "dialect_prompt": "Yo, what's your vibe? Pick how I should talk to you: 😎",
         "dialect_slang_button": "😎 Slang",
         "dialect_formal_button": "🎩 Formal",
@@ -152,8 +212,11 @@ MESSAGES = {
         "admin_status_games_loaded": "🎮 Game data loaded successfully. Total games: {num_games}.",
         "admin_status_games_not_loaded": "❌ Game data not loaded. Check server logs.",
         "admin_status_analytics_loaded": "📊 Analytics loaded. Total unique users: {total_users}.",
+        "admin_status_outbound": "📮 Outbound: {queued} queued, {waiting} waiting on rate limits, {delayed} delayed sends (avg {avg_delay:.2f}s), {throttled} rate-limit responses.",
+        "admin_status_flows": "🧵 Flows: {live} active ({breakdown}), {expired} expired, {evicted} evicted for capacity.",
         "admin_reload_prompt": "🔄 Attempting to reload game data...",
         "admin_reload_success": "✅ Game data reloaded successfully!",
+        "admin_reload_diff": "📦 {added} added, {changed} changed, {removed} removed.",
         "admin_reload_fail": "❌ Failed to reload game data. Check server logs.",
         "admin_analytics_report_intro": "📊 *Bot Usage Analytics*\n\n",
         "admin_analytics_total_users": "👥 *Total Unique Users:* {total_users}\n\n",
@@ -163,6 +226,8 @@ MESSAGES = {
         "admin_analytics_top_searches_intro": "*Top Searches:*\n",
         "admin_analytics_top_searches_item": "  `{query}`: {count} hits\n",
         "admin_analytics_top_searches_none": "  _No searches yet._\n",
+        "admin_analytics_top_searches_approx_item": "  `{query}`: ~{count} hits (±{error})\n",
+        "admin_analytics_top_searches_error": "  _Counts are approximate and may be up to {max_error} too high._\n",
         "admin_analytics_game_views_intro": "*Game Details Views:*\n",
         "admin_analytics_game_views_item": "  `{game_title}`: {count} views\n",
         "admin_analytics_game_views_none": "  _No game details viewed yet._\n",
@@ -172,6 +237,13 @@ MESSAGES = {
         "admin_analytics_feedback_intro": "*Feedback Types:*\n",
         "admin_analytics_feedback_item": "  `{f_type}`: {count} received\n",
         "admin_analytics_feedback_none": "  _No feedback received yet._\n",
+        "admin_analytics_trends_intro": "*Activity Trends:*\n",
+        "admin_analytics_trends_window": "  {window}: {commands} commands, {searches} searches, {views} views, {new_users} new users\n",
+        "admin_analytics_trends_last_hour": "Last hour",
+        "admin_analytics_trends_last_day": "Last 24 hours",
+        "admin_analytics_trends_last_week": "Last 7 days",
+        "admin_analytics_trends_peak": "  Busiest hour (24 hours): {hour} UTC with {count} events\n",
+        "admin_analytics_trends_daily": "  Daily (7 days): `{sparkline}`\n",
         "admin_unknown_cmd": "Unknown admin command.",
         "admin_unauthorized": "🚫 You are not authorized to use admin commands.",
         "admin_menu_prompt": "⚙️ *Admin Panel:*\nSelect an action:",
@@ -196,6 +268,8 @@ MESSAGES = {
         "pagination_previous": "⬅️ Previous",
         "pagination_next": "Next ➡️",
         "pagination_view_all": "🔍 View All Results on Glitchify",
+        "album_game_details": "✨ {position}. {title}",
+        "album_game_share": "📤 Share #{position}",
         "dialect_prompt": "Please select your preferred communication style: 🎩",
         "dialect_slang_button": "😎 Slang",
         "dialect_formal_button": "🎩 Formal",
@@ -204,254 +278,332 @@ MESSAGES = {
     }
 }
 
+_messages = MessageCatalogue(MESSAGES, default="slang") # Compiled messages, texts and keyboards per dialect
+
+def get_dialect(chat_id):
+    """Returns the user's dialect preference."""
+    return _state.get_dialect(chat_id) or _messages.default # Default to slang
+
 def get_message(chat_id, key, **kwargs):
     """Retrieves a message string based on user's dialect preference."""
-    str_chat_id = str(chat_id)
-    dialect = _user_dialects.get(str_chat_id, "slang") # Default to slang
-    message_template = MESSAGES.get(dialect, MESSAGES["slang"]).get(key, f"Error: Message key '{key}' not found for dialect '{dialect}'")
-    return message_template.format(**kwargs)
+    return _messages.message(get_dialect(chat_id), key, **kwargs)
+
+def get_dialect_message(dialect, key, **kwargs):
+    """Retrieves a message string in the given dialect."""
+    return _messages.message(dialect, key, **kwargs)
 
 # --- Data Loading Functions ---
 def load_games():
     """
-    Loads game data from the specified DATA_URL and updates the global _games_data.
+    Loads game data from the specified DATA_URL and rebuilds the global _catalogue.
+    The new catalogue, with all its indexes and views, is built off to the side and then
+    published with a single reference swap, so readers see either the old or the new one.
+    It's built as a delta of the current one (see GameCatalogue.updated), and the added,
+    changed and removed games are recorded in _catalogue_diff.
+    If the index hasn't changed since the last load (HTTP 304), the catalogue is kept as is;
+    if the load fails (including a malformed game list), so is the last good catalogue
+    (e.g. from the snapshot).
+    New data is saved to CATALOGUE_SNAPSHOT_FILE for the next cold start.
     Returns True on success, False on failure.
     """
-    global _games_data
-    try:
-        response = requests.get(DATA_URL)
-        response.raise_for_status()
-        _games_data = response.json()
-        print(f"Successfully loaded {len(_games_data)} games.")
+    global _catalogue, _catalogue_diff
+    with _catalogue_lock:
+        try:
+            games = _catalogue_source.fetch(conditional=len(_catalogue) > 0)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Error loading games data from {DATA_URL}: {e}")
+            return False
+        if games is None:
+            print(f"Games data unchanged, keeping {len(_catalogue)} games.")
+            _catalogue_diff = {"added": [], "changed": [], "removed": []}
+            return True
+        try:
+            catalogue, diff = _catalogue.updated(games)
+        except Exception as e: # A game list check_games() let through but the catalogue can't use
+            print(f"Error building the catalogue from {DATA_URL}: {e}")
+            _catalogue_source.forget_validators() # Or the next fetch would be a 304 for this list
+            return False
+        _catalogue_diff = diff
+        print(f"Successfully loaded {len(catalogue)} games: {len(_catalogue_diff['added'])} added, "
+              f"{len(_catalogue_diff['changed'])} changed, {len(_catalogue_diff['removed'])} removed.")
+        if catalogue is _catalogue:
+            return True
+        _catalogue = catalogue
+        _renderer.retain(catalogue) # Unchanged games keep their rendered payloads
+        try:
+            _catalogue_source.save_snapshot(CATALOGUE_SNAPSHOT_FILE, games)
+        except Exception as e: # Only costs the next cold start a full fetch
+            print(f"Error saving catalogue snapshot: {e}")
         return True
-    except requests.exceptions.RequestException as e:
-        print(f"Error loading games data from {DATA_URL}: {e}")
-        _games_data = []
-        return False
 
-def load_analytics():
+def request_catalogue_refresh(chat_id=None, reply_to_message_id=None):
+    """Asks the background refresher to reload the catalogue now; chat_id, if given, is told how it went."""
+    _refresh_requests.put((chat_id, reply_to_message_id))
+
+def run_catalogue_refresher():
     """
-    Loads analytics data from the JSON file.
-    Initializes with default structure if file not found or corrupted.
+    Background loop: reloads the catalogue every CATALOGUE_REFRESH_INTERVAL seconds, and
+    as soon as a refresh is requested. Requests that arrive during a reload share the next one.
     """
-    global _analytics_data
-    default_analytics = {
-        "total_users": 0,
-        "unique_users": [], # List of chat_ids
-        "commands_used": defaultdict(int), # Stores command_name: count
-        "game_details_views": defaultdict(int), # Stores game_url: count
-        "game_shares": defaultdict(int), # Stores game_url: count
-        "feedback_types": defaultdict(int), # Stores feedback_type: count
-        "top_searches": defaultdict(int) # Stores query: count
-    }
-    if os.path.exists(ANALYTICS_FILE):
+    while True:
         try:
-            with open(ANALYTICS_FILE, 'r') as f:
-                loaded_data = json.load(f)
-                # Convert dicts back to defaultdicts for easier incrementing
-                _analytics_data = {
-                    "total_users": loaded_data.get("total_users", 0),
-                    "unique_users": loaded_data.get("unique_users", []),
-                    "commands_used": defaultdict(int, loaded_data.get("commands_used", {})),
-                    "game_details_views": defaultdict(int, loaded_data.get("game_details_views", {})),
-                    "game_shares": defaultdict(int, loaded_data.get("game_shares", {})),
-                    "feedback_types": defaultdict(int, loaded_data.get("feedback_types", {})),
-                    "top_searches": defaultdict(int, loaded_data.get("top_searches", {}))
-                }
-            print(f"Successfully loaded analytics data.")
-        except json.JSONDecodeError as e:
-            print(f"Error decoding analytics JSON: {e}. Starting with empty analytics.")
-            _analytics_data = default_analytics
-    else:
-        print("Analytics file not found. Starting with empty analytics.")
-        _analytics_data = default_analytics
+            waiting = [_refresh_requests.get(timeout=CATALOGUE_REFRESH_INTERVAL or None)]
+        except queue.Empty:
+            waiting = [] # Scheduled refresh
+        while True:
+            try:
+                waiting.append(_refresh_requests.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            success = load_games()
+        except Exception as e: # Keep the thread alive for the next refresh
+            print(f"Catalogue refresh failed: {e}")
+            success = False
+        for chat_id, reply_to_message_id in waiting:
+            if chat_id is None:
+                continue
+            if success:
+                text = get_message(chat_id, "admin_reload_success") + "\n" + get_message(
+                    chat_id, "admin_reload_diff", **{change: len(urls) for change, urls in _catalogue_diff.items()})
+            else:
+                text = get_message(chat_id, "admin_reload_fail")
+            outbox.send_message(chat_id=chat_id, text=text, reply_to_message_id=reply_to_message_id)
 
-def save_analytics():
+def load_games_snapshot():
     """
-    Saves analytics data to the JSON file.
+    Builds the global _catalogue from CATALOGUE_SNAPSHOT_FILE.
+    Returns True if there was a usable snapshot.
     """
-    try:
-        # Convert defaultdicts back to regular dicts for JSON serialization
-        serializable_analytics = {
-            "total_users": _analytics_data["total_users"],
-            "unique_users": list(_analytics_data["unique_users"]), # Ensure it's a list
-            "commands_used": dict(_analytics_data["commands_used"]),
-            "game_details_views": dict(_analytics_data["game_details_views"]),
-            "game_shares": dict(_analytics_data["game_shares"]),
-            "feedback_types": dict(_analytics_data["feedback_types"]),
-            "top_searches": dict(_analytics_data["top_searches"])
-        }
-        with open(ANALYTICS_FILE, 'w') as f:
-            json.dump(serializable_analytics, f, indent=4)
-        print("Analytics data saved.")
-    except IOError as e:
-        print(f"Error saving analytics data: {e}")
+    global _catalogue
+    games = _catalogue_source.load_snapshot(CATALOGUE_SNAPSHOT_FILE)
+    if games is None:
+        return False
+    _catalogue = GameCatalogue(games)
+    print(f"Loaded {len(_catalogue)} games from the catalogue snapshot.")
+    return True
 
-def load_user_dialects():
-    """
-    Loads user dialect preferences from the JSON file.
-    """
-    global _user_dialects
-    if os.path.exists(DIALECTS_FILE):
-        try:
-            with open(DIALECTS_FILE, 'r') as f:
-                _user_dialects = json.load(f)
-            print(f"Successfully loaded {len(_user_dialects)} user dialects.")
-        except json.JSONDecodeError as e:
-            print(f"Error decoding user dialects JSON: {e}. Starting with empty preferences.")
-            _user_dialects = {}
-    else:
-        print("User dialects file not found. Starting with empty preferences.")
-        _user_dialects = {}
+def find_game(game_url):
+    """Returns the game with the given URL path, or None if it's not in the catalogue."""
+    return _catalogue.get(game_url)
 
-def save_user_dialects():
-    """
-    Saves user dialect preferences to the JSON file.
-    """
-    try:
-        with open(DIALECTS_FILE, 'w') as f:
-            json.dump(_user_dialects, f, indent=4)
-        print("User dialects saved.")
-    except IOError as e:
-        print(f"Error saving user dialects: {e}")
+def game_title_for_url(game_url):
+    """Returns the title for a game URL, falling back to the URL itself for unknown games."""
+    game = _catalogue.get(game_url)
+    return game['title'] if game else game_url
 
 # --- Analytics Tracking Functions ---
+# These only update memory; _analytics persists them in the background
 def track_user(chat_id):
-    str_chat_id = str(chat_id)
-    if str_chat_id not in _analytics_data["unique_users"]:
-        _analytics_data["unique_users"].append(str_chat_id)
-        _analytics_data["total_users"] = len(_analytics_data["unique_users"])
-        save_analytics()
+    _analytics.track_user(chat_id)
 
 def track_command(command_name):
-    _analytics_data["commands_used"][command_name] += 1
-    save_analytics()
+    _analytics.increment("commands_used", command_name)
 
 def track_game_view(game_url):
-    _analytics_data["game_details_views"][game_url] += 1
-    save_analytics()
+    _analytics.increment("game_details_views", game_url)
 
 def track_game_share(game_url):
-    _analytics_data["game_shares"][game_url] += 1
-    save_analytics()
+    _analytics.increment("game_shares", game_url)
 
 def track_feedback(feedback_type):
-    _analytics_data["feedback_types"][feedback_type] += 1
-    save_analytics()
+    _analytics.increment("feedback_types", feedback_type)
 
 def track_search(query):
-    _analytics_data["top_searches"][query.lower()] += 1
-    save_analytics()
+    _analytics.track_search(query.lower())
+
+_report = AnalyticsReport(_analytics, get_dialect_message, game_title_for_url) # Cached /analytics report per dialect
+_renderer = GameRenderer(get_dialect_message) # Cached captions, keyboards and media per game and dialect
 
 # Initial loads when the bot starts
-initial_load_success = load_games()
-if not initial_load_success:
-    print("Initial game data load failed. Bot may not function correctly for game-related commands.")
-load_analytics() # Load analytics on startup
-load_user_dialects() # New: Load user dialects on startup
+if load_games_snapshot():
+    request_catalogue_refresh() # Serve the snapshot right away and refresh from DATA_URL in the background
+else:
+    initial_load_success = load_games()
+    if not initial_load_success:
+        print("Initial game data load failed. Bot may not function correctly for game-related commands.")
+_db.import_json(ANALYTICS_FILE, ANALYTICS_USERS_FILE, DIALECTS_FILE) # First start on the database: bring over the old JSON files
+_analytics.load() # Load analytics on startup
+_analytics.start() # Flush analytics periodically and on shutdown
+outbox.start() # Deliver queued Bot API calls in the background
+_state.load() # Load user dialects on startup
+_state.start(STATE_SWEEP_INTERVAL) # Sweep expired conversation flows periodically
+threading.Thread(target=run_catalogue_refresher, name="catalogue-refresher", daemon=True).start() # Keep the catalogue fresh
 
 # --- Formatting Functions ---
+# Rendered once per game (and dialect) by _renderer; the returned payloads are shared, don't modify them
 def format_game(game):
-    page_url = f"https://glitchify.space/{game['url'].lstrip('/')}"
-    img_url = page_url.rsplit('/', 1)[0] + "/screenshot1.jpg"
-    return {
-        "text": f"*{game['title']}*\n🏷️ `{', '.join(game['tags'])}`\n🕒 `{game['modified']}`",
-        "url": page_url,
-        "thumb": img_url
-    }
+    return _renderer.render(game)
 
 def format_game_details(game):
-    description = game.get('description', 'No description available.')
-    genre = ', '.join(game.get('tags', []))
-    release_date = game.get('release_date', 'N/A')
-
-    return (
-        f"*{game['title']}*\n\n"
-        f"📝 *Description:*\n{description}\n\n"
-        f"🏷️ *Tags/Genre:* `{genre}`\n"
-        f"🕒 *Last Modified:* `{game['modified']}`\n"
-        f"🗓️ *Release Date:* `{release_date}`"
-    )
+    return _renderer.render(game)["details"]
 
 # --- Telegram API Interaction Functions ---
-def send_game(chat_id, game):
+def get_outbound_status(chat_id):
+    """Returns the admin status line with outbound queue and rate limiter metrics."""
+    stats = rate_limiter.stats()
+    return get_message(
+        chat_id, "admin_status_outbound",
+        queued=outbox.pending(),
+        waiting=stats["waiting"],
+        delayed=stats["delayed"],
+        avg_delay=stats["delay_seconds"] / stats["delayed"] if stats["delayed"] else 0.0,
+        throttled=stats["throttled"]
+    )
+
+def get_game_inline_keyboard(chat_id, game):
+    """Returns the view/details/share inline keyboard shown under a game's photo."""
+    return _renderer.keyboard(game, get_dialect(chat_id))
+
+def get_game_input_media(game):
+    """Returns a game as an InputMediaPhoto, for albums and editMessageMedia."""
+    return _renderer.render(game)["media"]
+
+def send_game(chat_id, game, sender=None):
+    """
+    Sends a game as a captioned photo with its inline keyboard.
+    Goes through the outbound queue unless another sender (e.g. the telegram client,
+    from a job already running on the chat's lane) is given; returns what it returns.
+    """
     msg = format_game(game)
-    callback_data_details = f"details:{game['url']}"
-    callback_data_share = f"share_game:{game['url']}"
-
-    inline_keyboard = [
-        [{"text": get_message(chat_id, "inline_view_on_glitchify"), "url": msg["url"]}],
-        [{"text": get_message(chat_id, "inline_get_full_scoop"), "callback_data": callback_data_details}],
-        [{"text": get_message(chat_id, "inline_share_game"), "callback_data": callback_data_share}]
-    ]
-
-    payload = {
-        "chat_id": chat_id,
-        "photo": msg["thumb"],
-        "caption": msg["text"],
-        "parse_mode": "Markdown",
-        "reply_markup": {
-            "inline_keyboard": inline_keyboard
-        }
-    }
-    requests.post(f"{BASE_URL}/sendPhoto", json=payload)
+    return (sender or outbox).send_photo(
+        chat_id=chat_id,
+        photo=msg["thumb"],
+        caption=msg["text"],
+        parse_mode="Markdown",
+        reply_markup=get_game_inline_keyboard(chat_id, game)
+    )
 
-# In-memory state tracking for requests
-user_request_states = {}
+def send_game_album(chat_id, games, sender=None):
+    """Sends several games as a single sendMediaGroup album, one captioned photo per game."""
+    return (sender or outbox).send_media_group(chat_id, [get_game_input_media(game) for game in games])
+
+# Conversation state tracking for requests (bounded; idle flows expire), kept by the state backend
+user_request_states = _state.flows
+
+def get_flow_status(chat_id):
+    """Returns the admin status line with conversation flow counters."""
+    stats = user_request_states.stats()
+    return get_message(
+        chat_id, "admin_status_flows",
+        live=sum(stats["live"].values()),
+        breakdown=", ".join(f"{flow}: {count}" for flow, count in sorted(stats["live"].items())) or "-",
+        expired=stats["expired"],
+        evicted=stats["evicted"]
+    )
 
-def get_main_reply_keyboard(chat_id): # Updated to take chat_id
-    """Returns the main reply keyboard markup."""
+# Keyboards and help texts are built per dialect once, at startup; they're shared, don't modify them
+def build_main_reply_keyboard(msg):
     return {
         "keyboard": [
-            [{"text": get_message(chat_id, "main_random_game")}, {"text": get_message(chat_id, "main_latest_games")}],
-            [{"text": get_message(chat_id, "main_request_game")}, {"text": get_message(chat_id, "main_send_feedback")}],
-            [{"text": get_message(chat_id, "main_vibe_check")}, {"text": get_message(chat_id, "main_help")}] # New vibe check button
+            [{"text": msg("main_random_game")}, {"text": msg("main_latest_games")}],
+            [{"text": msg("main_request_game")}, {"text": msg("main_send_feedback")}],
+            [{"text": msg("main_vibe_check")}, {"text": msg("main_help")}] # New vibe check button
         ],
         "resize_keyboard": True,
         "one_time_keyboard": False
     }
 
-def get_cancel_reply_keyboard(chat_id): # Updated to take chat_id
-    """Returns a reply keyboard with only a cancel button."""
+def build_cancel_reply_keyboard(msg):
     return {
         "keyboard": [
-            [{"text": get_message(chat_id, "cancel_button")}]
+            [{"text": msg("cancel_button")}]
         ],
         "resize_keyboard": True,
         "one_time_keyboard": True # Disappear after use
     }
 
-def get_admin_inline_keyboard(chat_id): # Updated to take chat_id
-    """Returns an inline keyboard markup for admin commands."""
+def build_admin_inline_keyboard(msg):
+    return {
+        "inline_keyboard": [
+            [{"text": msg("admin_analytics_button"), "callback_data": "admin_cmd:analytics"}],
+            [{"text": msg("admin_reload_button"), "callback_data": "admin_cmd:reload_data"}],
+            [{"text": msg("admin_status_button"), "callback_data": "admin_cmd:status"}]
+        ]
+    }
+
+def build_dialect_inline_keyboard(msg):
+    # One button per dialect in MESSAGES
     return {
         "inline_keyboard": [
-            [{"text": get_message(chat_id, "admin_analytics_button"), "callback_data": "admin_cmd:analytics"}],
-            [{"text": get_message(chat_id, "admin_reload_button"), "callback_data": "admin_cmd:reload_data"}],
-            [{"text": get_message(chat_id, "admin_status_button"), "callback_data": "admin_cmd:status"}]
+            [{"text": msg(f"dialect_{dialect}_button"), "callback_data": f"set_dialect:{dialect}"}] for dialect in _messages.dialects
         ]
     }
 
-def send_search_page(chat_id, all_results, query, page):
+def build_help_text(msg):
+    help_text = msg("help_intro")
+    for key in ("help_search", "help_random", "help_latest", "help_request", "help_feedback",
+                "help_details", "help_share", "help_cancel", "help_vibe"):
+        help_text += msg(key) + "\n\n"
+    return help_text
+
+def build_admin_help_text(msg):
+    help_text = msg("help_admin_intro")
+    for key in ("help_admin_menu", "help_admin_status", "help_reload_data"):
+        help_text += msg(key) + "\n"
+    return help_text + msg("help_analytics") + "\n\n"
+
+_messages.register("main_reply_keyboard", build_main_reply_keyboard)
+_messages.register("cancel_reply_keyboard", build_cancel_reply_keyboard)
+_messages.register("admin_inline_keyboard", build_admin_inline_keyboard)
+_messages.register("dialect_inline_keyboard", build_dialect_inline_keyboard)
+_messages.register("help", lambda msg: build_help_text(msg) + msg("help_outro"))
+_messages.register("admin_help", lambda msg: build_help_text(msg) + build_admin_help_text(msg) + msg("help_outro"))
+
+def get_main_reply_keyboard(chat_id): # Updated to take chat_id
+    """Returns the main reply keyboard markup."""
+    return _messages.composed(get_dialect(chat_id), "main_reply_keyboard")
+
+def get_cancel_reply_keyboard(chat_id): # Updated to take chat_id
+    """Returns a reply keyboard with only a cancel button."""
+    return _messages.composed(get_dialect(chat_id), "cancel_reply_keyboard")
+
+def get_admin_inline_keyboard(chat_id): # Updated to take chat_id
+    """Returns an inline keyboard markup for admin commands."""
+    return _messages.composed(get_dialect(chat_id), "admin_inline_keyboard")
+
+def get_search_results(search_state):
+    """
+    Returns (catalogue, result_indices) for a search_pagination state, re-running the
+    query first if the catalogue has been reloaded since the search (or the positions
+    don't fit it, which should never happen as versions come from the games' content).
+    """
+    catalogue = _catalogue
+    indices = search_state["indices"]
+    if search_state["version"] != catalogue.version or (indices and max(indices) >= len(catalogue)):
+        search_state["indices"] = catalogue.search_indices(search_state["query"])
+        search_state["version"] = catalogue.version
+    return catalogue, search_state["indices"]
+
+def send_search_page(chat_id, catalogue, result_indices, query, page):
     """
     Sends a page of search results, including pagination controls.
-    Attempts to delete the previous pagination message.
+    Replaces the previous pagination message (or, in edit-in-place mode, edits the
+    previous page's messages).
     """
-    total_games = len(all_results)
+    total_games = len(result_indices)
     total_pages = (total_games + GAMES_PER_PAGE - 1) // GAMES_PER_PAGE
 
     start_index = page * GAMES_PER_PAGE
     end_index = min(start_index + GAMES_PER_PAGE, total_games)
-    current_page_games = all_results[start_index:end_index]
+    current_page_games = catalogue.games_at(result_indices[start_index:end_index])
 
     if not current_page_games:
-        requests.post(f"{BASE_URL}/sendMessage", json={
-            "chat_id": chat_id,
-            "text": get_message(chat_id, "no_games_on_page")
-        })
+        outbox.send_message(
+            chat_id=chat_id,
+            text=get_message(chat_id, "no_games_on_page")
+        )
         return
 
-    for game in current_page_games:
-        send_game(chat_id, game)
+    as_album = SEARCH_RESULTS_AS_ALBUM and len(current_page_games) > 1 # Albums need at least two items
+    game_button_rows = []
+    if as_album:
+        # Album photos can't carry inline buttons, so each game's buttons move to the control message
+        for position, game in enumerate(current_page_games, start=start_index + 1):
+            game_button_rows.append([
+                {"text": get_message(chat_id, "album_game_details", position=position, title=game['title']), "callback_data": f"details:{game['url']}"},
+                {"text": get_message(chat_id, "album_game_share", position=position), "callback_data": f"share_game:{game['url']}"}
+            ])
 
     pagination_buttons_row = []
     if page > 0:
@@ -466,98 +618,580 @@ def send_search_page(chat_id, all_results, query, page):
     if total_games > 0:
         more_results_button_row.append({"text": get_message(chat_id, "pagination_view_all"), "url": f"https://glitchify.space/search-results.html?q={query.replace(' ', '%20')}"})
 
-    reply_markup = {}
-    keyboard_rows = []
-    if pagination_buttons_row:
-        keyboard_rows.append(pagination_buttons_row)
+    keyboard_rows = game_button_rows + [pagination_buttons_row]
     if more_results_button_row:
         keyboard_rows.append(more_results_button_row)
-    
-    if keyboard_rows:
-        reply_markup = {"inline_keyboard": keyboard_rows}
+    reply_markup = {"inline_keyboard": keyboard_rows}
+
+    control_text = get_message(chat_id, "search_results_intro", query=query, page_num=page + 1, total_pages=total_pages)
+    search_state = user_request_states.get(chat_id)
+    if not search_state or search_state.get("flow") != "search_pagination":
+        search_state = None
+    # The whole page is one job on the chat's lane, so photos and controls arrive in order
+    outbox.run(chat_id, deliver_search_page, chat_id, current_page_games, as_album, control_text, reply_markup, search_state)
+
+def deliver_search_page(chat_id, games, as_album, control_text, reply_markup, search_state):
+    """
+    Delivers a page of search results; runs on the chat's outbound lane.
+    In edit-in-place mode the previous page's messages are edited. Otherwise, or if an
+    edit fails, the photos are sent fresh and the control message is replaced.
+    search_state is the search_pagination state the page was requested from, or None.
+    """
+    if search_state is not None:
+        search_state = user_request_states.refresh(chat_id, search_state) # Another worker may have updated it
+    if PAGINATION_EDIT_IN_PLACE and search_state and \
+       edit_search_page(chat_id, games, as_album, control_text, reply_markup, search_state):
+        return
+
+    page_message_ids = []
+    if as_album:
+        sent_messages = send_game_album(chat_id, games, sender=telegram) or []
+        page_message_ids = [m.get("message_id") for m in sent_messages]
+    else:
+        for game in games:
+            sent_message = send_game(chat_id, game, sender=telegram)
+            if sent_message:
+                page_message_ids.append(sent_message.get("message_id"))
+    send_pagination_controls(chat_id, control_text, reply_markup, search_state)
+    if search_state is not None:
+        search_state["page_message_ids"] = page_message_ids
+        search_state["page_as_album"] = as_album
+
+def edit_search_page(chat_id, games, as_album, control_text, reply_markup, search_state):
+    """
+    Turns the previous page's messages into this page with editMessageMedia/editMessageText.
+    Surplus photos (a shorter last page) are deleted. Returns False if the page can't be
+    edited in place (different layout, too few messages, or a failed edit).
+    """
+    page_message_ids = search_state.get("page_message_ids") or []
+    control_message_id = search_state.get("pagination_message_id")
+    if not control_message_id or search_state.get("page_as_album") != as_album or len(page_message_ids) < len(games):
+        return False
+
+    for message_id, game in zip(page_message_ids, games):
+        reply_markup_for_game = None if as_album else get_game_inline_keyboard(chat_id, game)
+        if not telegram.edit_message_media(chat_id, message_id, get_game_input_media(game), reply_markup=reply_markup_for_game):
+            print(f"Editing page message {message_id} failed for chat {chat_id}, resending the page")
+            return False
+    for message_id in page_message_ids[len(games):]:
+        telegram.delete_message(chat_id, message_id)
+    if not telegram.edit_message_text(chat_id, control_message_id, control_text, parse_mode="Markdown", reply_markup=reply_markup):
+        print(f"Editing pagination message {control_message_id} failed for chat {chat_id}, resending the page")
+        return False
+    search_state["page_message_ids"] = page_message_ids[:len(games)]
+    return True
 
-    if chat_id in user_request_states and \
-       user_request_states[chat_id].get("flow") == "search_pagination" and \
-       user_request_states[chat_id].get("pagination_message_id"):
-        prev_message_id = user_request_states[chat_id]["pagination_message_id"]
+def send_pagination_controls(chat_id, text, reply_markup, search_state):
+    """
+    Replaces the search's previous pagination message with a new one and remembers its ID
+    in search_state (the search_pagination state the page was requested from, or None).
+    Runs on the chat's outbound lane, after the page's photos have been sent.
+    """
+    if search_state and search_state.get("pagination_message_id"):
+        prev_message_id = search_state["pagination_message_id"]
         print(f"Attempting to delete previous pagination message {prev_message_id} for chat {chat_id}")
-        try:
-            delete_response = requests.post(f"{BASE_URL}/deleteMessage", json={
-                "chat_id": chat_id,
-                "message_id": prev_message_id
-            })
-            print(f"Delete message response: {delete_response.status_code} - {delete_response.text}")
-        except Exception as e:
-            print(f"Error deleting previous pagination message for chat {chat_id}: {e}")
-
-    if reply_markup:
-        response = requests.post(f"{BASE_URL}/sendMessage", json={
-            "chat_id": chat_id,
-            "text": get_message(chat_id, "search_results_intro", query=query, page_num=page + 1, total_pages=total_pages),
-            "parse_mode": "Markdown",
-            "reply_markup": reply_markup
-        })
-        print(f"Send pagination message response: {response.status_code} - {response.text}")
-        if response.status_code == 200:
-            message_id = response.json().get("result", {}).get("message_id")
-            if message_id:
-                user_request_states[chat_id]["pagination_message_id"] = message_id
-                print(f"Stored new pagination message ID: {message_id}")
-            else:
-                print(f"No message_id found in response for chat {chat_id}")
-        else:
-            print(f"Failed to send pagination message for chat {chat_id}: {response.text}")
+        telegram.delete_message(chat_id, prev_message_id)
+
+    sent_message = telegram.send_message(
+        chat_id=chat_id,
+        text=text,
+        parse_mode="Markdown",
+        reply_markup=reply_markup
+    )
+    if sent_message:
+        message_id = sent_message.get("message_id")
+        if not message_id:
+            print(f"No message_id found in response for chat {chat_id}")
+        elif search_state is not None:
+            search_state["pagination_message_id"] = message_id
+            print(f"Stored new pagination message ID: {message_id}")
     else:
-        requests.post(f"{BASE_URL}/sendMessage", json={
-            "chat_id": chat_id,
-            "text": f"Here are the results for '{query}':" # This specific message is kept neutral
-        })
+        print(f"Failed to send pagination message for chat {chat_id}")
 
-def handle_inline_query(inline_query_id, query_string):
+def handle_inline_query(inline_query_id, query_string, user_id=None, offset=""):
     """
     Handles incoming inline queries and sends back search results.
+    The answer is worked out on the user's outbound lane, and skipped if the user has
+    typed a newer query by then; Telegram only shows the latest one anyway.
+    Queries without a sender are keyed on their own ID, so they neither share a lane
+    nor supersede each other.
     """
-    results = []
-    if _games_data:
-        search_results = [g for g in _games_data if query_string.lower() in g["title"].lower()]
-
-        for i, game in enumerate(search_results[:50]): # Telegram limits to 50 results
-            formatted_game = format_game(game)
-            
-            inline_keyboard_buttons = [
-                [{"text": MESSAGES["slang"]["inline_view_on_glitchify"], "url": formatted_game["url"]}], # Inline query buttons are always slang for consistency
-                [{"text": MESSAGES["slang"]["inline_get_full_scoop"], "callback_data": f"details:{game['url']}"}]
-            ]
+    key = user_id if user_id is not None else inline_query_id
+    _inline_search.received(key, inline_query_id)
+    outbox.run(("inline", key), answer_inline_query, inline_query_id, query_string, key, offset)
 
-            results.append({
-                "type": "photo",
-                "id": str(i) + "_" + game["url"],
-                "photo_url": formatted_game["thumb"],
-                "thumb_url": formatted_game["thumb"],
-                "caption": formatted_game["text"],
-                "parse_mode": "Markdown",
-                "reply_markup": {"inline_keyboard": inline_keyboard_buttons}
-            })
+def answer_inline_query(inline_query_id, query_string, key, offset):
+    """
+    Sends a page of up to 50 results for an inline query; runs on the user's outbound lane.
+    key is the user ID (or the query's own ID) handle_inline_query() recorded it under.
+    """
+    if _inline_search.is_superseded(key, inline_query_id):
+        return
+    results = []
+    next_offset = ""
+    if _catalogue:
+        games, start, next_offset = _inline_search.page(_catalogue, query_string, offset)
+        for i, game in enumerate(games, start):
+            results.append({**format_game(game)["inline_result"], "id": str(i) + "_" + game["url"]})
     
-    if not results:
+    if not results and not offset:
         results.append({
             "type": "article",
             "id": "no_results",
             "title": "No Games Found 😔",
             "input_message_content": {
-                "message_text": MESSAGES["slang"]["inline_no_results"].format(query_string=query_string), # Inline query messages are always slang
+                "message_text": get_dialect_message("slang", "inline_no_results", query_string=query_string), # Inline query messages are always slang
                 "parse_mode": "Markdown"
             },
             "description": "Try a different search term."
         })
 
-    payload = {
-        "inline_query_id": inline_query_id,
-        "results": results,
-        "cache_time": 0
-    }
-    requests.post(f"{BASE_URL}/answerInlineQuery", json=payload)
+    # Results are the same for everyone (buttons are always slang), so Telegram may share its cached answer
+    telegram.answer_inline_query(inline_query_id, results, cache_time=INLINE_CACHE_TIME,
+                                 is_personal=False, next_offset=next_offset, retry_later=True)
+
 
+_router = Router(_messages) # Command, button, callback and flow dispatch tables
+
+def is_admin_chat(chat_id):
+    return ADMIN_ID is not None and chat_id == ADMIN_ID
+
+# --- Callback Handlers (inline buttons) ---
+@_router.callback("details")
+def handle_details_callback(chat_id, message_id, game_url_path):
+    track_game_view(game_url_path)
+    found_game = find_game(game_url_path)
+
+    if found_game:
+        detailed_text = format_game_details(found_game)
+        outbox.send_message(
+            chat_id=chat_id,
+            text=detailed_text,
+            parse_mode="Markdown",
+            reply_to_message_id=message_id
+        )
+    else:
+        outbox.send_message(
+            chat_id=chat_id,
+            text=get_message(chat_id, "game_details_not_found"),
+            reply_to_message_id=message_id
+        )
+
+@_router.callback("share_game")
+def handle_share_game_callback(chat_id, message_id, game_url_path):
+    track_game_share(game_url_path)
+    found_game = find_game(game_url_path)
+
+    if found_game:
+        share_text = f"Check out this game: *{found_game['title']}*\n🔗 {format_game(found_game)['url']}"
+        share_keyboard = {
+            "inline_keyboard": [
+                [{"text": get_message(chat_id, "share_game_button"), "switch_inline_query": found_game['title']}]
+            ]
+        }
+        outbox.send_message(
+            chat_id=chat_id,
+            text=share_text,
+            parse_mode="Markdown",
+            reply_markup=share_keyboard
+        )
+    else:
+        outbox.send_message(
+            chat_id=chat_id,
+            text=get_message(chat_id, "game_not_found_share"),
+            reply_to_message_id=message_id
+        )
+
+@_router.callback("feedback_type")
+def handle_feedback_type_callback(chat_id, message_id, feedback_type):
+    user_request_states[chat_id] = {"flow": "feedback", "step": "message", "type": feedback_type}
+    outbox.send_message(
+        chat_id=chat_id,
+        text=get_message(chat_id, "feedback_prompt", feedback_type=feedback_type),
+        reply_markup=get_cancel_reply_keyboard(chat_id)
+    )
+
+@_router.callback("paginate")
+def handle_paginate_callback(chat_id, message_id, page):
+    requested_page = int(page)
+    search_state = user_request_states.get(chat_id)
+
+    if search_state is not None and search_state.get("flow") == "search_pagination":
+        catalogue, result_indices = get_search_results(search_state)
+        stored_query = search_state["query"]
+
+        total_pages = (len(result_indices) + GAMES_PER_PAGE - 1) // GAMES_PER_PAGE
+        if 0 <= requested_page < total_pages:
+            send_search_page(chat_id, catalogue, result_indices, stored_query, requested_page)
+        else:
+            outbox.send_message(
+                chat_id=chat_id,
+                text=get_message(chat_id, "end_of_results")
+            )
+    else:
+        outbox.send_message(
+            chat_id=chat_id,
+            text=get_message(chat_id, "search_lost_track")
+        )
+
+@_router.callback("cancel_feedback_flow", "cancel_settings_flow")
+def handle_cancel_flow_callback(chat_id, message_id, _):
+    if user_request_states.pop(chat_id) is not None:
+        outbox.send_message(
+            chat_id=chat_id,
+            text=get_message(chat_id, "cancel_success"),
+            reply_markup=get_main_reply_keyboard(chat_id)
+        )
+
+@_router.callback("admin_cmd")
+def handle_admin_callback(chat_id, message_id, admin_command):
+    if not is_admin_chat(chat_id):
+        outbox.send_message(
+            chat_id=chat_id,
+            text=get_message(chat_id, "admin_unauthorized"),
+            reply_to_message_id=message_id
+        )
+        return
+    if admin_command == "status":
+        track_command("/admin_status_inline")
+        outbox.send_message(
+            chat_id=chat_id,
+            text=get_admin_status(chat_id),
+            parse_mode="Markdown",
+            reply_to_message_id=message_id
+        )
+    elif admin_command == "reload_data":
+        track_command("/reload_data_inline")
+        outbox.send_message(
+            chat_id=chat_id,
+            text=get_message(chat_id, "admin_reload_prompt"),
+            reply_to_message_id=message_id
+        )
+        request_catalogue_refresh(chat_id, message_id) # Reloads off the webhook thread and reports back
+    elif admin_command == "analytics":
+        track_command("/analytics_inline")
+        analytics_report = _report.render(get_dialect(chat_id), _catalogue.version)
+
+        outbox.send_message(
+            chat_id=chat_id,
+            text=analytics_report,
+            parse_mode="Markdown",
+            reply_to_message_id=message_id
+        )
+    else:
+        outbox.send_message(
+            chat_id=chat_id,
+            text=get_message(chat_id, "admin_unknown_cmd"),
+            reply_to_message_id=message_id
+        )
+
+@_router.callback("set_dialect") # New: Handle dialect selection
+def handle_set_dialect_callback(chat_id, message_id, dialect):
+    if dialect in _messages.dialects:
+        _state.set_dialect(chat_id, dialect)
+        outbox.send_message(
+            chat_id=chat_id,
+            text=get_message(chat_id, f"dialect_set_{dialect}"),
+            reply_markup=get_main_reply_keyboard(chat_id) # Update keyboard to reflect new dialect
+        )
+    else:
+        outbox.send_message(
+            chat_id=chat_id,
+            text=get_message(chat_id, "admin_unknown_cmd") # Re-using for unknown dialect
+        )
+
+# --- Admin Commands (Text-based and /admin_menu) ---
+def get_admin_status(chat_id):
+    """Returns the admin status report: catalogue, analytics, outbound queue and flows."""
+    status_text = get_message(chat_id, "admin_status_running") + "\n"
+    if _catalogue:
+        status_text += get_message(chat_id, "admin_status_games_loaded", num_games=len(_catalogue)) + "\n"
+    else:
+        status_text += get_message(chat_id, "admin_status_games_not_loaded") + "\n"
+    status_text += get_message(chat_id, "admin_status_analytics_loaded", total_users=_analytics.data['total_users']) + "\n"
+    status_text += get_outbound_status(chat_id) + "\n"
+    status_text += get_flow_status(chat_id)
+    return status_text
+
+@_router.message("/admin_status", admin=True, before_flows=True, exact=True)
+def handle_admin_status(chat_id, text):
+    track_command("/admin_status")
+    outbox.send_message(
+        chat_id=chat_id,
+        text=get_admin_status(chat_id),
+        parse_mode="Markdown"
+    )
+
+@_router.message("/reload_data", admin=True, before_flows=True, exact=True)
+def handle_reload_data(chat_id, text):
+    track_command("/reload_data")
+    outbox.send_message(
+        chat_id=chat_id,
+        text=get_message(chat_id, "admin_reload_prompt")
+    )
+    request_catalogue_refresh(chat_id) # Reloads off the webhook thread and reports back
+
+@_router.message("/analytics", admin=True, before_flows=True, exact=True)
+def handle_analytics(chat_id, text):
+    track_command("/analytics")
+    analytics_report = _report.render(get_dialect(chat_id), _catalogue.version)
+
+    outbox.send_message(
+        chat_id=chat_id,
+        text=analytics_report,
+        parse_mode="Markdown"
+    )
+
+@_router.message("/admin_menu", admin=True, before_flows=True, exact=True)
+def handle_admin_menu(chat_id, text):
+    track_command("/admin_menu")
+    outbox.send_message(
+        chat_id=chat_id,
+        text=get_message(chat_id, "admin_menu_prompt"),
+        parse_mode="Markdown",
+        reply_markup=get_admin_inline_keyboard(chat_id)
+    )
+
+def handle_unknown_admin_command(chat_id, text):
+    outbox.send_message(
+        chat_id=chat_id,
+        text=get_message(chat_id, "admin_unauthorized")
+    )
+
+# --- Cancel Command (prioritized) ---
+@_router.message("/cancel", button="cancel_button", before_flows=True, exact=True)
+def handle_cancel(chat_id, text):
+    track_command("/cancel")
+    if user_request_states.pop(chat_id) is not None:
+        outbox.send_message(
+            chat_id=chat_id,
+            text=get_message(chat_id, "cancel_success"),
+            reply_markup=get_main_reply_keyboard(chat_id)
+        )
+    else:
+        outbox.send_message(
+            chat_id=chat_id,
+            text=get_message(chat_id, "nothing_to_cancel"),
+            reply_markup=get_main_reply_keyboard(chat_id)
+        )
+
+# --- Multi-step Flows (Game Request & Feedback) ---
+@_router.flow("game_request")
+def handle_game_request_flow(chat_id, text, state):
+    if state.get("step") == "title":
+        state["title"] = text
+        state["step"] = "platform"
+        outbox.send_message(
+            chat_id=chat_id,
+            text=get_message(chat_id, "game_request_platform_prompt"),
+            reply_markup=get_cancel_reply_keyboard(chat_id)
+        )
+    elif state.get("step") == "platform":
+        title = state["title"]
+        platform = text
+        del user_request_states[chat_id]
+        msg = f"📥 *New Game Request:*\n\n🎮 *Title:* {title}\n🕹️ *Platform:* {platform}\n👤 From user: `{chat_id}`"
+        outbox.send_message(
+            chat_id=ADMIN_ID,
+            text=msg,
+            parse_mode="Markdown",
+            priority=PRIORITY_BACKGROUND
+        )
+        outbox.send_message(
+            chat_id=chat_id,
+            text=get_message(chat_id, "game_request_sent"),
+            reply_markup=get_main_reply_keyboard(chat_id)
+        )
+
+@_router.flow("feedback")
+def handle_feedback_flow(chat_id, text, state):
+    if state.get("step") == "message":
+        feedback_type = state["type"]
+        feedback_message = text
+        track_feedback(feedback_type)
+        del user_request_states[chat_id]
+
+        admin_feedback_msg = (
+            f"📧 *New Feedback Received:*\n\n"
+            f"📝 *Type:* {feedback_type}\n"
+            f"💬 *Message:*\n{feedback_message}\n\n"
+            f"👤 From user: `{chat_id}`"
+        )
+        if ADMIN_ID is not None:
+            outbox.send_message(
+                chat_id=ADMIN_ID,
+                text=admin_feedback_msg,
+                parse_mode="Markdown",
+                priority=PRIORITY_BACKGROUND
+            )
+        else:
+            print(f"Admin ID not set, feedback not sent to admin: {admin_feedback_msg}")
+
+        outbox.send_message(
+            chat_id=chat_id,
+            text=get_message(chat_id, "feedback_sent"),
+            reply_markup=get_main_reply_keyboard(chat_id)
+        )
+
+# --- Regular Commands and Natural Language Search ---
+@_router.message("/start")
+def handle_start(chat_id, text):
+    track_command("/start")
+    outbox.send_message(
+        chat_id=chat_id,
+        text=get_message(chat_id, "welcome"),
+        parse_mode="Markdown",
+        reply_markup=get_main_reply_keyboard(chat_id)
+    )
+    # If admin, also send the admin inline keyboard
+    if is_admin_chat(chat_id):
+        outbox.send_message(
+            chat_id=chat_id,
+            text=get_message(chat_id, "admin_quick_actions"),
+            parse_mode="Markdown",
+            reply_markup=get_admin_inline_keyboard(chat_id)
+        )
+
+@_router.message("/help", button="main_help")
+def handle_help(chat_id, text):
+    track_command("/help")
+    help_text = _messages.composed(get_dialect(chat_id), "admin_help" if is_admin_chat(chat_id) else "help")
+
+    outbox.send_message(
+        chat_id=chat_id,
+        text=help_text,
+        parse_mode="Markdown"
+    )
+
+@_router.message("/random", button="main_random_game")
+def handle_random(chat_id, text):
+    track_command("/random")
+    if not _catalogue:
+        outbox.send_message(
+            chat_id=chat_id,
+            text=get_message(chat_id, "game_data_load_fail")
+        )
+        return
+
+    send_game(chat_id, _catalogue.random_game(chat_id))
+
+@_router.message("/latest", button="main_latest_games")
+def handle_latest(chat_id, text):
+    track_command("/latest")
+    if not _catalogue:
+        outbox.send_message(
+            chat_id=chat_id,
+            text=get_message(chat_id, "game_data_load_fail")
+        )
+        return
+
+    for game in _catalogue.latest(LATEST_GAMES_COUNT):
+        send_game(chat_id, game)
+    if len(_catalogue) > LATEST_GAMES_COUNT:
+        outbox.send_message(
+            chat_id=chat_id,
+            text=f"🔎 Found {len(_catalogue)} latest drops. View more on Glitchify: https://glitchify.space/search-results.html?q=latest", # This specific message is kept neutral
+            parse_mode="Markdown"
+        )
+
+@_router.message("/request", button="main_request_game")
+def handle_request(chat_id, text):
+    track_command("/request")
+    user_request_states[chat_id] = {"flow": "game_request", "step": "title"}
+    outbox.send_message(
+        chat_id=chat_id,
+        text=get_message(chat_id, "game_request_title_prompt"),
+        reply_markup=get_cancel_reply_keyboard(chat_id)
+    )
+
+@_router.message("/feedback", button="main_send_feedback")
+def handle_feedback(chat_id, text):
+    track_command("/feedback")
+    outbox.send_message(
+        chat_id=chat_id,
+        text=get_message(chat_id, "feedback_prompt", feedback_type=""), # Feedback prompt is generic here
+        reply_markup={
+            "inline_keyboard": [
+                [{"text": get_message(chat_id, "feedback_bug_report"), "callback_data": "feedback_type:Bug Report"}],
+                [{"text": get_message(chat_id, "feedback_suggestion"), "callback_data": "feedback_type:Suggestion"}],
+                [{"text": get_message(chat_id, "feedback_general"), "callback_data": "feedback_type:General Feedback"}],
+                [{"text": get_message(chat_id, "cancel_button"), "callback_data": "cancel_feedback_flow"}]
+            ]
+        }
+    )
+
+@_router.message("/vibe", button="main_vibe_check") # New: Dialect command
+def handle_vibe(chat_id, text):
+    track_command("/vibe")
+    outbox.send_message(
+        chat_id=chat_id,
+        text=get_message(chat_id, "dialect_prompt"),
+        reply_markup=_messages.composed(get_dialect(chat_id), "dialect_inline_keyboard")
+    )
+
+def handle_search(chat_id, query):
+    """Natural language search: the fallback for messages that aren't a command or button."""
+    track_command("search")
+    track_search(query)
+    if not _catalogue:
+        outbox.send_message(
+            chat_id=chat_id,
+            text=get_message(chat_id, "game_data_load_fail")
+        )
+        return
+
+    catalogue = _catalogue
+    result_indices = catalogue.search_indices(query)
+
+    if result_indices:
+        # Only positions are kept; get_search_results() re-runs the query after a reload
+        user_request_states[chat_id] = {
+            "flow": "search_pagination",
+            "query": query,
+            "version": catalogue.version,
+            "indices": result_indices,
+            "pagination_message_id": None
+        }
+        send_search_page(chat_id, catalogue, result_indices, query, page=0)
+    else:
+        outbox.send_message(
+            chat_id=chat_id,
+            text=get_message(chat_id, "no_games_found_search", query=query)
+        )
+
+def handle_message(chat_id, user_msg):
+    """
+    Routes a text message: admin commands and cancel first, then the chat's ongoing flow
+    if it has one (other than browsing search results), then commands and buttons, and
+    otherwise a search.
+    """
+    lower_msg = user_msg.lower()
+    is_admin = is_admin_chat(chat_id)
+    route = _router.match_message(lower_msg, get_dialect(chat_id))
+    handler, admin_only, before_flows = route or (None, False, False)
+    if admin_only and not is_admin:
+        handler = None # Not a command for anyone else; search for it like any other text
+    elif handler is None and is_admin and lower_msg.startswith("/admin_"):
+        handler, before_flows = handle_unknown_admin_command, True
+    if handler is not None and before_flows:
+        handler(chat_id, user_msg)
+        return
+
+    state = user_request_states.get(chat_id)
+    # search_pagination only backs the result pages' buttons and doesn't wait for a reply,
+    # so the chat carries on as normal (a new search replaces it)
+    if state is not None and state.get("flow") != "search_pagination":
+        flow_handler = _router.match_flow(state.get("flow"))
+        if flow_handler is not None:
+            flow_handler(chat_id, user_msg, state)
+        else:
+            outbox.send_message(
+                chat_id=chat_id,
+                text=get_message(chat_id, "in_middle_of_flow")
+            )
+        return
+
+    (handler or handle_search)(chat_id, user_msg)
 
 @app.route(f"/{BOT_TOKEN}", methods=["POST"])
 def webhook():
@@ -567,225 +1201,20 @@ def webhook():
     if "inline_query" in data:
         inline_query_id = data["inline_query"]["id"]
         query_string = data["inline_query"]["query"].strip()
-        handle_inline_query(inline_query_id, query_string)
+        user_id = data["inline_query"].get("from", {}).get("id")
+        handle_inline_query(inline_query_id, query_string, user_id, data["inline_query"].get("offset", ""))
         return "OK"
 
     # --- Handle Callback Queries (for inline buttons) ---
     if "callback_query" in data:
         query = data["callback_query"]
         chat_id = query["message"]["chat"]["id"]
-        callback_data = query["data"]
-        message_id = query["message"]["message_id"]
-        str_chat_id = str(chat_id) # Define str_chat_id here for use in callbacks
-
-        requests.post(f"{BASE_URL}/answerCallbackQuery", json={"callback_query_id": query["id"]})
-
-        if callback_data.startswith("details:"):
-            game_url_path = callback_data[len("details:"):]
-            track_game_view(game_url_path)
-            found_game = next((g for g in _games_data if g["url"] == game_url_path), None)
-
-            if found_game:
-                detailed_text = format_game_details(found_game)
-                requests.post(f"{BASE_URL}/sendMessage", json={
-                    "chat_id": chat_id,
-                    "text": detailed_text,
-                    "parse_mode": "Markdown",
-                    "reply_to_message_id": message_id
-                })
-            else:
-                requests.post(f"{BASE_URL}/sendMessage", json={
-                    "chat_id": chat_id,
-                    "text": get_message(chat_id, "game_details_not_found"),
-                    "reply_to_message_id": message_id
-                })
-        elif callback_data.startswith("share_game:"):
-            game_url_path = callback_data[len("share_game:"):]
-            track_game_share(game_url_path)
-            found_game = next((g for g in _games_data if g["url"] == game_url_path), None)
-
-            if found_game:
-                share_text = f"Check out this game: *{found_game['title']}*\n🔗 {format_game(found_game)['url']}"
-                share_keyboard = {
-                    "inline_keyboard": [
-                        [{"text": get_message(chat_id, "share_game_button"), "switch_inline_query": found_game['title']}]
-                    ]
-                }
-                requests.post(f"{BASE_URL}/sendMessage", json={
-                    "chat_id": chat_id,
-                    "text": share_text,
-                    "parse_mode": "Markdown",
-                    "reply_markup": share_keyboard
-                })
-            else:
-                requests.post(f"{BASE_ID}/sendMessage", json={ # Fixed BASE_ID to BASE_URL
-                    "chat_id": chat_id,
-                    "text": get_message(chat_id, "game_not_found_share"),
-                    "reply_to_message_id": message_id
-                })
-            return "OK"
-        elif callback_data.startswith("feedback_type:"):
-            feedback_type = callback_data[len("feedback_type:"):]
-            user_request_states[chat_id] = {"flow": "feedback", "step": "message", "type": feedback_type}
-            requests.post(f"{BASE_URL}/sendMessage", json={
-                "chat_id": chat_id,
-                "text": get_message(chat_id, "feedback_prompt", feedback_type=feedback_type),
-                "reply_markup": get_cancel_reply_keyboard(chat_id)
-            })
-        elif callback_data.startswith("paginate:"):
-            requested_page = int(callback_data.split(":")[1])
-            
-            if chat_id in user_request_states and user_request_states[chat_id].get("flow") == "search_pagination":
-                stored_results = user_request_states[chat_id]["results"]
-                stored_query = user_request_states[chat_id]["query"]
-                
-                total_pages = (len(stored_results) + GAMES_PER_PAGE - 1) // GAMES_PER_PAGE
-                if 0 <= requested_page < total_pages:
-                    send_search_page(chat_id, stored_results, stored_query, requested_page)
-                else:
-                    requests.post(f"{BASE_URL}/sendMessage", json={
-                        "chat_id": chat_id,
-                        "text": get_message(chat_id, "end_of_results")
-                    })
-            else:
-                requests.post(f"{BASE_URL}/sendMessage", json={
-                    "chat_id": chat_id,
-                    "text": get_message(chat_id, "search_lost_track")
-                })
-            return "OK"
-        elif callback_data == "cancel_feedback_flow" or callback_data == "cancel_settings_flow":
-            if chat_id in user_request_states:
-                del user_request_states[chat_id]
-                requests.post(f"{BASE_URL}/sendMessage", json={
-                    "chat_id": chat_id,
-                    "text": get_message(chat_id, "cancel_success"),
-                    "reply_markup": get_main_reply_keyboard(chat_id)
-                })
-            return "OK"
-        elif callback_data.startswith("admin_cmd:"):
-            admin_command = callback_data[len("admin_cmd:"):]
-            
-            if ADMIN_ID and str_chat_id == ADMIN_ID:
-                if admin_command == "status":
-                    track_command("/admin_status_inline")
-                    status_text = get_message(chat_id, "admin_status_running") + "\n"
-                    if _games_data:
-                        status_text += get_message(chat_id, "admin_status_games_loaded", num_games=len(_games_data)) + "\n"
-                    else:
-                        status_text += get_message(chat_id, "admin_status_games_not_loaded") + "\n"
-                    status_text += get_message(chat_id, "admin_status_analytics_loaded", total_users=_analytics_data['total_users'])
-                    requests.post(f"{BASE_URL}/sendMessage", json={
-                        "chat_id": chat_id,
-                        "text": status_text,
-                        "parse_mode": "Markdown",
-                        "reply_to_message_id": message_id
-                    })
-                elif admin_command == "reload_data":
-                    track_command("/reload_data_inline")
-                    requests.post(f"{BASE_URL}/sendMessage", json={
-                        "chat_id": chat_id,
-                        "text": get_message(chat_id, "admin_reload_prompt"),
-                        "reply_to_message_id": message_id
-                    })
-                    success = load_games()
-                    if success:
-                        requests.post(f"{BASE_URL}/sendMessage", json={
-                            "chat_id": chat_id,
-                            "text": get_message(chat_id, "admin_reload_success"),
-                            "reply_to_message_id": message_id
-                        })
-                    else:
-                        requests.post(f"{BASE_URL}/sendMessage", json={
-                            "chat_id": chat_id,
-                            "text": get_message(chat_id, "admin_reload_fail"),
-                            "reply_to_message_id": message_id
-                        })
-                elif admin_command == "analytics":
-                    track_command("/analytics_inline")
-                    analytics_report = get_message(chat_id, "admin_analytics_report_intro")
-                    analytics_report += get_message(chat_id, "admin_analytics_total_users", total_users=_analytics_data['total_users'])
-                    
-                    analytics_report += get_message(chat_id, "admin_analytics_commands_used_intro")
-                    if _analytics_data["commands_used"]:
-                        sorted_commands = sorted(_analytics_data["commands_used"].items(), key=lambda item: item[1], reverse=True)
-                        for cmd, count in sorted_commands:
-                            analytics_report += get_message(chat_id, "admin_analytics_commands_used_item", cmd=cmd, count=count)
-                    else:
-                        analytics_report += get_message(chat_id, "admin_analytics_commands_used_none")
-                    analytics_report += "\n"
-
-                    analytics_report += get_message(chat_id, "admin_analytics_top_searches_intro")
-                    if _analytics_data["top_searches"]:
-                        sorted_searches = sorted(_analytics_data["top_searches"].items(), key=lambda item: item[1], reverse=True)[:5]
-                        for query, count in sorted_searches:
-                            analytics_report += get_message(chat_id, "admin_analytics_top_searches_item", query=query, count=count)
-                    else:
-                        analytics_report += get_message(chat_id, "admin_analytics_top_searches_none")
-                    analytics_report += "\n"
-
-                    analytics_report += get_message(chat_id, "admin_analytics_game_views_intro")
-                    if _analytics_data["game_details_views"]:
-                        sorted_views = sorted(_analytics_data["game_details_views"].items(), key=lambda item: item[1], reverse=True)[:5]
-                        for url, count in sorted_views:
-                            game_title = next((g['title'] for g in _games_data if g['url'] == url), url)
-                            analytics_report += get_message(chat_id, "admin_analytics_game_views_item", game_title=game_title, count=count)
-                    else:
-                        analytics_report += get_message(chat_id, "admin_analytics_game_views_none")
-                    analytics_report += "\n"
-
-                    analytics_report += get_message(chat_id, "admin_analytics_game_shares_intro")
-                    if _analytics_data["game_shares"]:
-                        sorted_shares = sorted(_analytics_data["game_shares"].items(), key=lambda item: item[1], reverse=True)[:5]
-                        for url, count in sorted_shares:
-                            game_title = next((g['title'] for g in _games_data if g['url'] == url), url)
-                            analytics_report += get_message(chat_id, "admin_analytics_game_shares_item", game_title=game_title, count=count)
-                    else:
-                        analytics_report += get_message(chat_id, "admin_analytics_game_shares_none")
-                    analytics_report += "\n"
-
-                    analytics_report += get_message(chat_id, "admin_analytics_feedback_intro")
-                    if _analytics_data["feedback_types"]:
-                        sorted_feedback = sorted(_analytics_data["feedback_types"].items(), key=lambda item: item[1], reverse=True)
-                        for f_type, count in sorted_feedback:
-                            analytics_report += get_message(chat_id, "admin_analytics_feedback_item", f_type=f_type, count=count)
-                    else:
-                        analytics_report += get_message(chat_id, "admin_analytics_feedback_none")
-                    
-                    requests.post(f"{BASE_URL}/sendMessage", json={
-                        "chat_id": chat_id,
-                        "text": analytics_report,
-                        "parse_mode": "Markdown",
-                        "reply_to_message_id": message_id
-                    })
-                else:
-                    requests.post(f"{BASE_URL}/sendMessage", json={
-                        "chat_id": chat_id,
-                        "text": get_message(chat_id, "admin_unknown_cmd"),
-                        "reply_to_message_id": message_id
-                    })
-            else:
-                requests.post(f"{BASE_URL}/sendMessage", json={
-                    "chat_id": chat_id,
-                    "text": get_message(chat_id, "admin_unauthorized"),
-                    "reply_to_message_id": message_id
-                })
-            return "OK"
-        elif callback_data.startswith("set_dialect:"): # New: Handle dialect selection
-            dialect = callback_data[len("set_dialect:"):]
-            if dialect in ["slang", "formal"]:
-                _user_dialects[str_chat_id] = dialect
-                save_user_dialects()
-                requests.post(f"{BASE_URL}/sendMessage", json={
-                    "chat_id": chat_id,
-                    "text": get_message(chat_id, f"dialect_set_{dialect}"),
-                    "reply_markup": get_main_reply_keyboard(chat_id) # Update keyboard to reflect new dialect
-                })
-            else:
-                requests.post(f"{BASE_URL}/sendMessage", json={
-                    "chat_id": chat_id,
-                    "text": get_message(chat_id, "admin_unknown_cmd") # Re-using for unknown dialect
-                })
-            return "OK"
+
+        outbox.answer_callback_query(chat_id, query["id"])
+
+        handler, argument = _router.match_callback(query["data"])
+        if handler is not None:
+            handler(chat_id, query["message"]["message_id"], argument)
         return "OK"
 
     # --- Handle Regular Messages ---
@@ -793,350 +1222,8 @@ def webhook():
         return "OK"
 
     chat_id = data["message"]["chat"]["id"]
-    user_msg = data["message"].get("text", "").strip()
-    lower_msg = user_msg.lower()
-    str_chat_id = str(chat_id)
-
     track_user(chat_id)
-
-    # --- Admin Commands (Text-based and new /admin_menu) ---
-    if ADMIN_ID and str_chat_id == ADMIN_ID:
-        if lower_msg == "/admin_status":
-            track_command("/admin_status")
-            status_text = get_message(chat_id, "admin_status_running") + "\n"
-            if _games_data:
-                status_text += get_message(chat_id, "admin_status_games_loaded", num_games=len(_games_data)) + "\n"
-            else:
-                status_text += get_message(chat_id, "admin_status_games_not_loaded") + "\n"
-            status_text += get_message(chat_id, "admin_status_analytics_loaded", total_users=_analytics_data['total_users'])
-            requests.post(f"{BASE_URL}/sendMessage", json={
-                "chat_id": chat_id,
-                "text": status_text,
-                "parse_mode": "Markdown"
-            })
-            return "OK"
-        elif lower_msg == "/reload_data":
-            track_command("/reload_data")
-            requests.post(f"{BASE_URL}/sendMessage", json={
-                "chat_id": chat_id,
-                "text": get_message(chat_id, "admin_reload_prompt")
-            })
-            success = load_games()
-            if success:
-                requests.post(f"{BASE_URL}/sendMessage", json={
-                    "chat_id": chat_id,
-                    "text": get_message(chat_id, "admin_reload_success")
-                })
-            else:
-                requests.post(f"{BASE_URL}/sendMessage", json={
-                    "chat_id": chat_id,
-                    "text": get_message(chat_id, "admin_reload_fail")
-                })
-            return "OK"
-        elif lower_msg == "/analytics":
-            track_command("/analytics")
-            analytics_report = get_message(chat_id, "admin_analytics_report_intro")
-            analytics_report += get_message(chat_id, "admin_analytics_total_users", total_users=_analytics_data['total_users'])
-            
-            analytics_report += get_message(chat_id, "admin_analytics_commands_used_intro")
-            if _analytics_data["commands_used"]:
-                sorted_commands = sorted(_analytics_data["commands_used"].items(), key=lambda item: item[1], reverse=True)
-                for cmd, count in sorted_commands:
-                    analytics_report += get_message(chat_id, "admin_analytics_commands_used_item", cmd=cmd, count=count)
-            else:
-                analytics_report += get_message(chat_id, "admin_analytics_commands_used_none")
-            analytics_report += "\n"
-
-            analytics_report += get_message(chat_id, "admin_analytics_top_searches_intro")
-            if _analytics_data["top_searches"]:
-                sorted_searches = sorted(_analytics_data["top_searches"].items(), key=lambda item: item[1], reverse=True)[:5]
-                for query, count in sorted_searches:
-                    analytics_report += get_message(chat_id, "admin_analytics_top_searches_item", query=query, count=count)
-            else:
-                analytics_report += get_message(chat_id, "admin_analytics_top_searches_none")
-            analytics_report += "\n"
-
-            analytics_report += get_message(chat_id, "admin_analytics_game_views_intro")
-            if _analytics_data["game_details_views"]:
-                sorted_views = sorted(_analytics_data["game_details_views"].items(), key=lambda item: item[1], reverse=True)[:5]
-                for url, count in sorted_views:
-                    game_title = next((g['title'] for g in _games_data if g['url'] == url), url)
-                    analytics_report += get_message(chat_id, "admin_analytics_game_views_item", game_title=game_title, count=count)
-            else:
-                analytics_report += get_message(chat_id, "admin_analytics_game_views_none")
-            analytics_report += "\n"
-
-            analytics_report += get_message(chat_id, "admin_analytics_game_shares_intro")
-            if _analytics_data["game_shares"]:
-                sorted_shares = sorted(_analytics_data["game_shares"].items(), key=lambda item: item[1], reverse=True)[:5]
-                for url, count in sorted_shares:
-                    game_title = next((g['title'] for g in _games_data if g['url'] == url), url)
-                    analytics_report += get_message(chat_id, "admin_analytics_game_shares_item", game_title=game_title, count=count)
-            else:
-                analytics_report += get_message(chat_id, "admin_analytics_game_shares_none")
-            analytics_report += "\n"
-
-            analytics_report += get_message(chat_id, "admin_analytics_feedback_intro")
-            if _analytics_data["feedback_types"]:
-                sorted_feedback = sorted(_analytics_data["feedback_types"].items(), key=lambda item: item[1], reverse=True)
-                for f_type, count in sorted_feedback:
-                    analytics_report += get_message(chat_id, "admin_analytics_feedback_item", f_type=f_type, count=count)
-            else:
-                analytics_report += get_message(chat_id, "admin_analytics_feedback_none")
-
-            requests.post(f"{BASE_URL}/sendMessage", json={
-                "chat_id": chat_id,
-                "text": analytics_report,
-                "parse_mode": "Markdown"
-            })
-            return "OK"
-        elif lower_msg == "/admin_menu":
-            track_command("/admin_menu")
-            requests.post(f"{BASE_URL}/sendMessage", json={
-                "chat_id": chat_id,
-                "text": get_message(chat_id, "admin_menu_prompt"),
-                "parse_mode": "Markdown",
-                "reply_markup": get_admin_inline_keyboard(chat_id)
-            })
-            return "OK"
-        elif lower_msg.startswith("/admin_"):
-            if not ADMIN_ID:
-                requests.post(f"{BASE_URL}/sendMessage", json={
-                    "chat_id": chat_id,
-                    "text": get_message(chat_id, "admin_unauthorized") # Re-using for not configured
-                })
-            else:
-                requests.post(f"{BASE_URL}/sendMessage", json={
-                    "chat_id": chat_id,
-                    "text": get_message(chat_id, "admin_unauthorized")
-                })
-            return "OK"
-
-    # --- Handle Cancel Command (prioritized) ---
-    if lower_msg == "/cancel" or lower_msg == get_message(chat_id, "cancel_button").lower():
-        track_command("/cancel")
-        if chat_id in user_request_states:
-            del user_request_states[chat_id]
-            requests.post(f"{BASE_URL}/sendMessage", json={
-                "chat_id": chat_id,
-                "text": get_message(chat_id, "cancel_success"),
-                "reply_markup": get_main_reply_keyboard(chat_id)
-            })
-        else:
-            requests.post(f"{BASE_URL}/sendMessage", json={
-                "chat_id": chat_id,
-                "text": get_message(chat_id, "nothing_to_cancel"),
-                "reply_markup": get_main_reply_keyboard(chat_id)
-            })
-        return "OK"
-
-    # --- Handle Multi-step Flows (Game Request & Feedback) ---
-    if chat_id in user_request_states:
-        current_flow = user_request_states[chat_id].get("flow")
-        current_step = user_request_states[chat_id].get("step")
-
-        if current_flow == "game_request":
-            if current_step == "title":
-                user_request_states[chat_id]["title"] = user_msg
-                user_request_states[chat_id]["step"] = "platform"
-                requests.post(f"{BASE_URL}/sendMessage", json={
-                    "chat_id": chat_id,
-                    "text": get_message(chat_id, "game_request_platform_prompt"),
-                    "reply_markup": get_cancel_reply_keyboard(chat_id)
-                })
-            elif current_step == "platform":
-                title = user_request_states[chat_id]["title"]
-                platform = user_msg
-                del user_request_states[chat_id]
-                msg = f"📥 *New Game Request:*\n\n🎮 *Title:* {title}\n🕹️ *Platform:* {platform}\n👤 From user: `{chat_id}`"
-                requests.post(f"{BASE_URL}/sendMessage", json={
-                    "chat_id": ADMIN_ID,
-                    "text": msg,
-                    "parse_mode": "Markdown"
-                })
-                requests.post(f"{BASE_URL}/sendMessage", json={
-                    "chat_id": chat_id,
-                    "text": get_message(chat_id, "game_request_sent"),
-                    "reply_markup": get_main_reply_keyboard(chat_id)
-                })
-            return "OK"
-
-        elif current_flow == "feedback":
-            if current_step == "message":
-                feedback_type = user_request_states[chat_id]["type"]
-                feedback_message = user_msg
-                track_feedback(feedback_type)
-                del user_request_states[chat_id]
-
-                admin_feedback_msg = (
-                    f"📧 *New Feedback Received:*\n\n"
-                    f"📝 *Type:* {feedback_type}\n"
-                    f"💬 *Message:*\n{feedback_message}\n\n"
-                    f"👤 From user: `{chat_id}`"
-                )
-                if ADMIN_ID:
-                    requests.post(f"{BASE_URL}/sendMessage", json={
-                        "chat_id": ADMIN_ID,
-                        "text": admin_feedback_msg,
-                        "parse_mode": "Markdown"
-                    })
-                else:
-                    print(f"Admin ID not set, feedback not sent to admin: {admin_feedback_msg}")
-
-                requests.post(f"{BASE_URL}/sendMessage", json={
-                    "chat_id": chat_id,
-                    "text": get_message(chat_id, "feedback_sent"),
-                    "reply_markup": get_main_reply_keyboard(chat_id)
-                })
-            return "OK"
-        
-        requests.post(f"{BASE_URL}/sendMessage", json={
-            "chat_id": chat_id,
-            "text": get_message(chat_id, "in_middle_of_flow")
-        })
-        return "OK"
-
-
-    # --- Handle Regular Commands and Natural Language Search ---
-    if lower_msg.startswith("/start"):
-        track_command("/start")
-        requests.post(f"{BASE_URL}/sendMessage", json={
-            "chat_id": chat_id,
-            "text": get_message(chat_id, "welcome"),
-            "parse_mode": "Markdown",
-            "reply_markup": get_main_reply_keyboard(chat_id)
-        })
-        # If admin, also send the admin inline keyboard
-        if ADMIN_ID and str_chat_id == ADMIN_ID:
-            requests.post(f"{BASE_URL}/sendMessage", json={
-                "chat_id": chat_id,
-                "text": get_message(chat_id, "admin_quick_actions"),
-                "parse_mode": "Markdown",
-                "reply_markup": get_admin_inline_keyboard(chat_id)
-            })
-
-    elif lower_msg.startswith("/help") or lower_msg == get_message(chat_id, "main_help").lower():
-        track_command("/help")
-        help_text = get_message(chat_id, "help_intro")
-        help_text += get_message(chat_id, "help_search") + "\n\n"
-        help_text += get_message(chat_id, "help_random") + "\n\n"
-        help_text += get_message(chat_id, "help_latest") + "\n\n"
-        help_text += get_message(chat_id, "help_request") + "\n\n"
-        help_text += get_message(chat_id, "help_feedback") + "\n\n"
-        help_text += get_message(chat_id, "help_details") + "\n\n"
-        help_text += get_message(chat_id, "help_share") + "\n\n"
-        help_text += get_message(chat_id, "help_cancel") + "\n\n"
-        help_text += get_message(chat_id, "help_vibe") + "\n\n" # New help entry
-        
-        if ADMIN_ID and str_chat_id == ADMIN_ID:
-            help_text += get_message(chat_id, "help_admin_intro")
-            help_text += get_message(chat_id, "help_admin_menu") + "\n"
-            help_text += get_message(chat_id, "help_admin_status") + "\n"
-            help_text += get_message(chat_id, "help_reload_data") + "\n"
-            help_text += get_message(chat_id, "help_analytics") + "\n\n"
-        help_text += get_message(chat_id, "help_outro")
-
-        requests.post(f"{BASE_URL}/sendMessage", json={
-            "chat_id": chat_id,
-            "text": help_text,
-            "parse_mode": "Markdown"
-        })
-
-    elif lower_msg.startswith("/random") or lower_msg == get_message(chat_id, "main_random_game").lower():
-        track_command("/random")
-        if not _games_data:
-            requests.post(f"{BASE_URL}/sendMessage", json={
-                "chat_id": chat_id,
-                "text": get_message(chat_id, "game_data_load_fail")
-            })
-            return "OK"
-
-        send_game(chat_id, random.choice(_games_data))
-
-    elif lower_msg.startswith("/latest") or lower_msg == get_message(chat_id, "main_latest_games").lower():
-        track_command("/latest")
-        if not _games_data:
-            requests.post(f"{BASE_URL}/sendMessage", json={
-                "chat_id": chat_id,
-                "text": get_message(chat_id, "game_data_load_fail")
-            })
-            return "OK"
-
-        sorted_games = sorted(_games_data, key=lambda g: g["modified"], reverse=True)
-        for game in sorted_games[:3]:
-            send_game(chat_id, game)
-        if len(sorted_games) > 3:
-                requests.post(f"{BASE_URL}/sendMessage", json={
-                "chat_id": chat_id,
-                "text": f"🔎 Found {len(sorted_games)} latest drops. View more on Glitchify: https://glitchify.space/search-results.html?q=latest", # This specific message is kept neutral
-                "parse_mode": "Markdown"
-            })
-
-    elif lower_msg.startswith("/request") or lower_msg == get_message(chat_id, "main_request_game").lower():
-        track_command("/request")
-        user_request_states[chat_id] = {"flow": "game_request", "step": "title"}
-        requests.post(f"{BASE_URL}/sendMessage", json={
-            "chat_id": chat_id,
-            "text": get_message(chat_id, "game_request_title_prompt"),
-            "reply_markup": get_cancel_reply_keyboard(chat_id)
-        })
-
-    elif lower_msg.startswith("/feedback") or lower_msg == get_message(chat_id, "main_send_feedback").lower():
-        track_command("/feedback")
-        requests.post(f"{BASE_URL}/sendMessage", json={
-            "chat_id": chat_id,
-            "text": get_message(chat_id, "feedback_prompt", feedback_type=""), # Feedback prompt is generic here
-            "reply_markup": {
-                "inline_keyboard": [
-                    [{"text": get_message(chat_id, "feedback_bug_report"), "callback_data": "feedback_type:Bug Report"}],
-                    [{"text": get_message(chat_id, "feedback_suggestion"), "callback_data": "feedback_type:Suggestion"}],
-                    [{"text": get_message(chat_id, "feedback_general"), "callback_data": "feedback_type:General Feedback"}],
-                    [{"text": get_message(chat_id, "cancel_button"), "callback_data": "cancel_feedback_flow"}]
-                ]
-            }
-        })
-    elif lower_msg.startswith("/vibe") or lower_msg == get_message(chat_id, "main_vibe_check").lower(): # New: Dialect command
-        track_command("/vibe")
-        requests.post(f"{BASE_URL}/sendMessage", json={
-            "chat_id": chat_id,
-            "text": get_message(chat_id, "dialect_prompt"),
-            "reply_markup": {
-                "inline_keyboard": [
-                    [{"text": get_message(chat_id, "dialect_slang_button"), "callback_data": "set_dialect:slang"}],
-                    [{"text": get_message(chat_id, "dialect_formal_button"), "callback_data": "set_dialect:formal"}]
-                ]
-            }
-        })
-    
-    # Natural Language Search (Fallback if no other command matches)
-    else:
-        query = user_msg
-        track_command("search")
-        track_search(query)
-        if not _games_data:
-            requests.post(f"{BASE_URL}/sendMessage", json={
-                "chat_id": chat_id,
-                "text": get_message(chat_id, "game_data_load_fail")
-            })
-            return "OK"
-
-        initial_results = [g for g in _games_data if query.lower() in g["title"].lower()]
-        final_results = initial_results
-
-        if final_results:
-            user_request_states[chat_id] = {
-                "flow": "search_pagination",
-                "query": query,
-                "results": final_results,
-                "pagination_message_id": None
-            }
-            send_search_page(chat_id, final_results, query, page=0)
-        else:
-            requests.post(f"{BASE_URL}/sendMessage", json={
-                "chat_id": chat_id,
-                "text": get_message(chat_id, "no_games_found_search", query=query)
-            })
-
+    handle_message(chat_id, data["message"].get("text", "").strip())
     return "OK"
 
 # Flask entrypoint (unchanged)
@@ -0,0 +1,46 @@
+from string import Formatter
+
+class MessageCatalogue:
+    """
+    Message strings per dialect, compiled once at startup. Messages without placeholders
+    are stored ready to send, the others as the template's bound str.format_map, and texts
+    or keyboards assembled from several messages (see register()) are built for every
+    dialect up front. Adding a dialect or language is adding its table to `messages`;
+    a lookup is two dict gets however many there are. Unknown dialects get `default`'s.
+    """
+
+    def __init__(self, messages, default="slang"):
+        self.default = default
+        self.dialects = tuple(messages) # Dialect names, in the order given
+        self._tables = {} # Stores dialect: {key: text, or the template's format_map}
+        self._composed = {} # Stores dialect: {name: value built by register()}
+        for dialect, templates in messages.items():
+            table = self._tables[dialect] = {}
+            for key, template in templates.items():
+                if any(field is not None for _, field, _, _ in Formatter().parse(template)):
+                    table[key] = template.format_map
+                else:
+                    table[key] = template.format() # Unescapes any {{ }}
+            self._composed[dialect] = {}
+
+    def message(self, dialect, key, **kwargs):
+        """Returns the message for key in dialect, with kwargs filled into its placeholders."""
+        entry = (self._tables.get(dialect) or self._tables[self.default]).get(key)
+        if entry is None:
+            return f"Error: Message key '{key}' not found for dialect '{dialect}'"
+        if type(entry) is str:
+            return entry
+        return entry(kwargs)
+
+    def register(self, name, build):
+        """
+        Builds a composite value (a whole text, a keyboard) for every dialect now, as
+        build(msg) with msg(key, **kwargs) formatting messages in that dialect.
+        composed() then hands out the prebuilt values, which are shared: don't modify them.
+        """
+        for dialect in self.dialects:
+            self._composed[dialect][name] = build(lambda key, **kwargs: self.message(dialect, key, **kwargs))
+
+    def composed(self, dialect, name):
+        """Returns the value register()ed under name for dialect."""
+        return (self._composed.get(dialect) or self._composed[self.default])[name]
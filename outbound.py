@@ -0,0 +1,137 @@
+import time
+import heapq
+import queue
+import atexit
+import itertools
+import threading
+from collections import deque
+
+from telegram_client import RetryAfter
+
+class OutboundQueue:
+    """
+    Fire-and-forget delivery of Bot API calls on background worker threads, so the
+    webhook can return as soon as it has decided what to send.
+    Every key (normally a chat ID) has its own FIFO of calls, and at most one of them
+    runs at a time, so calls for one chat run strictly in the order they were submitted.
+    With a limiter, a chat that isn't ready for another send (RateLimiter.ready_at) is
+    set aside on a timer instead of holding up its lane, so the other chats on the lane
+    carry on meanwhile. The queued helpers below make their calls with retry_later, so a
+    call answered with 429 goes back to the front of its key's FIFO the same way.
+    """
+
+    def __init__(self, client, workers=8, limiter=None):
+        self.client = client
+        self.limiter = limiter
+        self._lanes = [queue.Queue() for _ in range(max(1, workers))] # Keys with a call ready to run
+        self._cond = threading.Condition()
+        self._jobs = {} # Stores key: deque of (fn, args, kwargs, attempt); present while the key is scheduled or running
+        self._not_before = {} # Stores key: time.monotonic() before which its 429'd call mustn't be retried
+        self._timers = [] # (ready at, seq, key) min-heap of keys set aside until their chat is ready
+        self._seq = itertools.count()
+        self._unfinished = 0 # Calls submitted and not yet done
+        self._started = False
+        # Metrics
+        self.deferred = 0 # Times a chat was set aside to wait for its per-chat limit
+
+    def start(self):
+        """Starts the worker threads and drains pending calls at interpreter shutdown."""
+        if self._started:
+            return
+        self._started = True
+        for i, lane in enumerate(self._lanes):
+            threading.Thread(target=self._work, args=(lane,), name=f"outbound-{i}", daemon=True).start()
+        threading.Thread(target=self._run_timers, name="outbound-timers", daemon=True).start()
+        atexit.register(self.join)
+
+    def _lane(self, key):
+        return self._lanes[hash(key) % len(self._lanes)]
+
+    def _work(self, lane):
+        while True:
+            key = lane.get()
+            ready_at = self.limiter.ready_at(key) if self.limiter is not None else 0.0
+            with self._cond:
+                ready_at = max(ready_at, self._not_before.get(key, 0.0))
+                if ready_at > time.monotonic():
+                    heapq.heappush(self._timers, (ready_at, next(self._seq), key))
+                    self.deferred += 1
+                    self._cond.notify_all()
+                    continue
+                self._not_before.pop(key, None)
+                fn, args, kwargs, attempt = self._jobs[key].popleft()
+            retry = None
+            try:
+                fn(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt < self.client.max_retries:
+                    retry = e.retry_after
+                else:
+                    print(f"Outbound job {getattr(fn, '__name__', fn)} failed: {e}, giving up")
+            except Exception as e:
+                print(f"Outbound job {getattr(fn, '__name__', fn)} failed: {e}")
+            finally:
+                with self._cond:
+                    if retry is not None:
+                        self._jobs[key].appendleft((fn, args, kwargs, attempt + 1))
+                        self._not_before[key] = time.monotonic() + retry
+                    else:
+                        self._unfinished -= 1
+                    if self._jobs[key]:
+                        lane.put(key) # Behind the lane's other keys, so chats take turns
+                    else:
+                        del self._jobs[key]
+                    self._cond.notify_all()
+
+    def _run_timers(self):
+        # Puts set-aside keys back on their lanes once their chat is ready
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                while self._timers and self._timers[0][0] <= now:
+                    key = heapq.heappop(self._timers)[2]
+                    self._lane(key).put(key)
+                self._cond.wait(self._timers[0][0] - now if self._timers else None)
+
+    def run(self, key, fn, *args, **kwargs):
+        """Queues fn(*args, **kwargs) behind key's other calls."""
+        with self._cond:
+            self._unfinished += 1
+            jobs = self._jobs.get(key)
+            if jobs is not None:
+                jobs.append((fn, args, kwargs, 0)) # Already scheduled; runs when its turn comes
+                return
+            self._jobs[key] = deque([(fn, args, kwargs, 0)])
+        self._lane(key).put(key)
+
+    def join(self):
+        """Blocks until every queued call has been delivered."""
+        with self._cond:
+            while self._unfinished:
+                self._cond.wait()
+
+    def pending(self):
+        """Returns the number of calls queued but not yet started."""
+        with self._cond:
+            return sum(len(jobs) for jobs in self._jobs.values())
+
+    # --- Queued counterparts of the TelegramClient helpers ---
+    # Each is a single call, so it can simply be run again after a 429 (retry_later)
+    def send_message(self, chat_id, text, **params):
+        self.run(chat_id, self.client.send_message, chat_id, text, retry_later=True, **params)
+
+    def send_photo(self, chat_id, photo, **params):
+        self.run(chat_id, self.client.send_photo, chat_id, photo, retry_later=True, **params)
+
+    def send_media_group(self, chat_id, media, **params):
+        self.run(chat_id, self.client.send_media_group, chat_id, media, retry_later=True, **params)
+
+    def delete_message(self, chat_id, message_id):
+        self.run(chat_id, self.client.delete_message, chat_id, message_id, retry_later=True)
+
+    def answer_callback_query(self, chat_id, callback_query_id, **params):
+        # Not a chat send, so it doesn't wait behind the chat's flood limit
+        self.run(("callback", chat_id), self.client.answer_callback_query, callback_query_id, retry_later=True, **params)
+
+    def answer_inline_query(self, inline_query_id, results, **params):
+        self.run(("inline", inline_query_id), self.client.answer_inline_query, inline_query_id, results, retry_later=True, **params)
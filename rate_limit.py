@@ -0,0 +1,131 @@
+import time
+import threading
+
+# Send priorities; lower values are served first when the global bucket is contended
+PRIORITY_INTERACTIVE = 0 # Replies to the user who is talking to the bot
+PRIORITY_BACKGROUND = 1 # Admin notifications and other non-interactive sends
+
+MAX_IDLE_CHAT_BUCKETS = 10000 # Full (idle) per-chat buckets are pruned beyond this
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0 # Set from Telegram's retry_after on 429 responses
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now, needed=1.0):
+        """Seconds until `needed` tokens are available (0 if they are now)."""
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+    def is_idle(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+class RateLimiter:
+    """
+    Paces outgoing sends against Telegram's flood limits: one global bucket plus one
+    bucket per chat. acquire() blocks the calling (outbound worker) thread only on the
+    global bucket; per-chat pacing is the caller's job, via ready_at() (the outbound
+    queue sets a chat aside until then instead of waiting on its lane). A send may take
+    a chat's bucket below zero, e.g. the photos of a search page, and the chat then
+    stays not ready until it has paid that back. Background sends leave one global
+    token per waiting interactive send, so interactive replies go first under load.
+    """
+
+    def __init__(self, global_rate=30.0, chat_rate=1.0, chat_burst=3):
+        self._cond = threading.Condition()
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._chats = {} # Stores chat_id: TokenBucket
+        self._waiting = [0, 0] # Sends currently waiting, by priority
+        # Metrics
+        self.sent = 0
+        self.delayed = 0
+        self.delay_seconds = 0.0
+        self.throttled = 0
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= MAX_IDLE_CHAT_BUCKETS:
+                now = time.monotonic()
+                for idle_chat in [c for c, b in self._chats.items() if b.is_idle(now)]:
+                    del self._chats[idle_chat]
+            bucket = self._chats[chat_id] = TokenBucket(self._chat_rate, self._chat_burst)
+        return bucket
+
+    def ready_at(self, chat_id):
+        """Returns the time.monotonic() at which chat_id may be sent to again (0.0 if it may now)."""
+        with self._cond:
+            bucket = self._chats.get(chat_id)
+            if bucket is None:
+                return 0.0
+            now = time.monotonic()
+            wait = bucket.wait_time(now)
+            return now + wait if wait > 0 else 0.0
+
+    def acquire(self, chat_id, priority=PRIORITY_INTERACTIVE):
+        """Blocks until the global bucket allows a send, then consumes its token and one of chat_id's."""
+        started = time.monotonic()
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    needed = 1.0
+                    if priority != PRIORITY_INTERACTIVE:
+                        needed += self._waiting[PRIORITY_INTERACTIVE]
+                    wait = self._global.wait_time(now, min(needed, self._global.capacity))
+                    if wait <= 0:
+                        self._global.tokens -= 1
+                        chat_bucket = self._chat_bucket(chat_id)
+                        chat_bucket.wait_time(now) # Refill before spending
+                        chat_bucket.tokens -= 1
+                        break
+                    self._cond.wait(wait)
+            finally:
+                self._waiting[priority] -= 1
+            waited = time.monotonic() - started
+            self.sent += 1
+            if waited > 0.001:
+                self.delayed += 1
+                self.delay_seconds += waited
+        return waited
+
+    def penalize(self, chat_id, retry_after):
+        """
+        Records a 429 response; chat_id isn't ready_at() again for retry_after seconds.
+        With chat_id None (calls that aren't paced, like answerCallbackQuery) it only counts the hit.
+        """
+        with self._cond:
+            self.throttled += 1
+            if chat_id is None:
+                return
+            bucket = self._chat_bucket(chat_id)
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + retry_after)
+            bucket.tokens = 0
+
+    def stats(self):
+        """Returns a snapshot of the limiter's counters."""
+        with self._cond:
+            return {
+                "waiting": sum(self._waiting),
+                "sent": self.sent,
+                "delayed": self.delayed,
+                "delay_seconds": self.delay_seconds,
+                "throttled": self.throttled,
+            }
@@ -0,0 +1,74 @@
+class Router:
+    """
+    Dispatch tables for incoming updates, so matching a message or callback is a couple of
+    dict lookups instead of a ladder of startswith() and button text comparisons.
+    Commands match on a message's first word (any "@botname" suffix dropped; exact commands
+    only when nothing follows), button texts
+    on the whole lowercased message in the sender's dialect, callbacks on the part of their
+    data before the first ":" (the rest is passed to the handler), and flows on the name
+    stored in the chat's flow state. Button texts come from `messages` (a MessageCatalogue)
+    and are looked up for every dialect at registration.
+    """
+
+    def __init__(self, messages):
+        self.messages = messages
+        self._commands = {} # Stores command: route
+        self._exact = set() # Commands that don't match when followed by arguments
+        self._buttons = {dialect: {} for dialect in messages.dialects} # Stores dialect: {lowercased button text: route}
+        self._callbacks = {} # Stores callback prefix: handler
+        self._flows = {} # Stores flow name: handler
+
+    def message(self, *commands, button=None, admin=False, before_flows=False, exact=False):
+        """
+        Decorator registering handler(chat_id, text) for commands and, if given, the button
+        whose message key is `button`. The route is returned by match_message() as
+        (handler, admin, before_flows): admin routes are only for the admin, and
+        before_flows routes are handled even while the chat is in the middle of a flow.
+        Exact commands match only on their own, not when followed by arguments.
+        """
+        def register(handler):
+            route = (handler, admin, before_flows)
+            for command in commands:
+                self._commands[command] = route
+                if exact:
+                    self._exact.add(command)
+            if button is not None:
+                for dialect, buttons in self._buttons.items():
+                    buttons[self.messages.message(dialect, button).lower()] = route
+            return handler
+        return register
+
+    def callback(self, *prefixes):
+        """Decorator registering handler(chat_id, message_id, argument) for callback data prefixes."""
+        def register(handler):
+            for prefix in prefixes:
+                self._callbacks[prefix] = handler
+            return handler
+        return register
+
+    def flow(self, name):
+        """Decorator registering handler(chat_id, text, state) for messages sent during a flow."""
+        def register(handler):
+            self._flows[name] = handler
+            return handler
+        return register
+
+    def match_message(self, lower_text, dialect):
+        """Returns the route for a lowercased message, or None if it isn't a known command or button."""
+        if lower_text.startswith("/"):
+            words = lower_text.split(None, 1)
+            command = words[0].partition("@")[0]
+            if len(words) == 1 or command not in self._exact:
+                route = self._commands.get(command)
+                if route is not None:
+                    return route
+        return (self._buttons.get(dialect) or self._buttons[self.messages.default]).get(lower_text)
+
+    def match_callback(self, data):
+        """Returns (handler, argument) for callback data, or (None, argument) for unknown data."""
+        prefix, _, argument = data.partition(":")
+        return self._callbacks.get(prefix), argument
+
+    def match_flow(self, name):
+        """Returns the handler for a flow, or None."""
+        return self._flows.get(name)
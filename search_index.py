@@ -0,0 +1,123 @@
+from array import array
+from bisect import bisect_left
+
+NGRAM_SIZE = 3 # Longest n-gram stored in the index; longer queries are verified against titles
+
+class TitleIndex:
+    """
+    Inverted n-gram index over lower-cased game titles.
+    search(query) returns exactly what `[g for g in games if query.lower() in g["title"].lower()]`
+    would, in the same order, without scanning every title.
+    """
+
+    def __init__(self, games, _postings=None):
+        self._games = games
+        self._titles = [g["title"].lower() for g in games]
+        if _postings is not None: # Built by updated()
+            self._postings = _postings
+            return
+        self._postings = {} # Stores n-gram: array of game indices (ascending)
+        for i, title in enumerate(self._titles):
+            for gram in self._grams(title):
+                posting = self._postings.get(gram)
+                if posting is None:
+                    posting = self._postings[gram] = array('I')
+                posting.append(i)
+
+    def updated(self, games, old_positions):
+        """
+        Returns a TitleIndex over games that reuses this index's postings instead of
+        re-deriving every title's n-grams. old_positions[i] is the position in this index
+        of an unchanged game (same title) now at position i, or -1 for new or changed games.
+        This index is left untouched, so it can keep serving while the new one is built.
+        """
+        remap = array('i', [-1]) * len(self._games) # Old position: new position, or -1 if dropped
+        for i, j in enumerate(old_positions):
+            if j >= 0:
+                remap[j] = i
+        postings = dict(self._postings)
+        copied = set() # Grams whose posting is already a private copy
+
+        def own(gram):
+            # Returns a posting of the new index that's safe to modify
+            if gram not in copied:
+                postings[gram] = array('I', postings.get(gram, ()))
+                copied.add(gram)
+            return postings[gram]
+
+        if all(new == old for old, new in enumerate(remap) if new >= 0):
+            # Surviving games kept their positions (in-place changes, appends, removals at
+            # the end): only the dropped positions' grams need touching
+            for j, i in enumerate(remap):
+                if i < 0:
+                    for gram in self._grams(self._titles[j]):
+                        posting = own(gram)
+                        del posting[bisect_left(posting, j)]
+        else:
+            # Positions moved: renumber every posting (still skips the n-gram derivation);
+            # renumbered postings only need re-sorting if surviving games changed order
+            survivors = [new for new in remap if new >= 0]
+            reordered = any(a > b for a, b in zip(survivors, survivors[1:]))
+            for gram, posting in self._postings.items():
+                renumbered = array('I', (remap[j] for j in posting if remap[j] >= 0))
+                postings[gram] = array('I', sorted(renumbered)) if reordered else renumbered
+                copied.add(gram)
+
+        new_index = TitleIndex(games, _postings=postings)
+        for i, j in enumerate(old_positions):
+            if j < 0:
+                for gram in self._grams(new_index._titles[i]):
+                    posting = own(gram)
+                    posting.insert(bisect_left(posting, i), i)
+        for gram in [gram for gram in copied if not postings[gram]]:
+            del postings[gram]
+        return new_index
+
+    @staticmethod
+    def _grams(title):
+        """Returns every distinct 1..NGRAM_SIZE character substring of a title."""
+        grams = set()
+        for n in range(1, NGRAM_SIZE + 1):
+            for start in range(len(title) - n + 1):
+                grams.add(title[start:start + n])
+        return grams
+
+    def __len__(self):
+        return len(self._games)
+
+    def search(self, query):
+        """Returns all games whose title contains query (case-insensitive), in catalogue order."""
+        return [self._games[i] for i in self.search_indices(query)]
+
+    def search_indices(self, query):
+        """
+        Like search(), but returns the matching positions in the games list as an array('I').
+        The array may be shared with the index, so callers must not modify it.
+        """
+        lowered = query.lower()
+        if not lowered:
+            return array('I', range(len(self._games)))
+
+        # Short queries are n-grams themselves, so their posting list is the exact answer
+        if len(lowered) <= NGRAM_SIZE:
+            return self._postings.get(lowered, array('I'))
+
+        # Longer queries: every trigram must occur in a matching title, so the rarest
+        # trigram's posting list bounds the candidates; verify those with a substring check
+        candidates = None
+        for start in range(len(lowered) - NGRAM_SIZE + 1):
+            posting = self._postings.get(lowered[start:start + NGRAM_SIZE])
+            if posting is None:
+                return array('I')
+            if candidates is None or len(posting) < len(candidates):
+                candidates = posting
+        return array('I', (i for i in candidates if lowered in self._titles[i]))
+
+    def refine_indices(self, indices, query):
+        """
+        Returns the positions among indices whose title contains query, as an array('I').
+        Narrows an earlier result: the matches for "mario k" are among those for "mario".
+        """
+        lowered = query.lower()
+        titles = self._titles
+        return array('I', (i for i in indices if lowered in titles[i]))
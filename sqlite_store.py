@@ -0,0 +1,236 @@
+import os
+import sys
+import json
+import sqlite3
+import threading
+
+from storage import read_int64_file
+from analytics import COUNTER_KEYS, SEARCHES_KEY
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dialects (
+    chat_id TEXT PRIMARY KEY,
+    dialect TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    counter TEXT NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (counter, key)
+);
+CREATE TABLE IF NOT EXISTS users (
+    chat_id INTEGER PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS sketches (
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    error INTEGER NOT NULL,
+    PRIMARY KEY (name, key)
+);
+CREATE TABLE IF NOT EXISTS series (
+    resolution TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (resolution, bucket, metric)
+);
+CREATE TABLE IF NOT EXISTS flows (
+    chat_id TEXT PRIMARY KEY,
+    flow TEXT,
+    token TEXT NOT NULL,
+    state TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS flows_expires_at ON flows (expires_at);
+"""
+
+class SQLiteStore:
+    """
+    Embedded SQLite database (WAL mode) holding dialect preferences, analytics counters,
+    unique users and, with the shared state backend, conversation flows.
+    Changes are small UPSERTs, each committed atomically, so there are no whole-file
+    rewrites to race with or to corrupt on a crash. Each thread gets its own connection.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self.db().executescript(SCHEMA)
+
+    def db(self):
+        """Returns this thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None) # Autocommit; see transaction()
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def transaction(self):
+        """
+        Context manager running the enclosed statements in one IMMEDIATE transaction.
+        Nested uses join the outer transaction.
+        """
+        return _Transaction(self.db())
+
+    # --- Dialects ---
+    def get_dialect(self, chat_id):
+        row = self.db().execute("SELECT dialect FROM dialects WHERE chat_id = ?", (str(chat_id),)).fetchone()
+        return row[0] if row else None
+
+    def all_dialects(self):
+        return dict(self.db().execute("SELECT chat_id, dialect FROM dialects").fetchall())
+
+    def set_dialect(self, chat_id, dialect):
+        with self.transaction() as db:
+            db.execute("INSERT INTO dialects (chat_id, dialect) VALUES (?, ?) "
+                       "ON CONFLICT (chat_id) DO UPDATE SET dialect = excluded.dialect", (str(chat_id), dialect))
+
+    # --- Analytics counters ---
+    def add_counts(self, counter, deltas):
+        """Adds {key: amount} to a named counter in one transaction, bumping its version."""
+        if not deltas:
+            return
+        with self.transaction() as db:
+            db.executemany("INSERT INTO counters (counter, key, count) VALUES (?, ?, ?) "
+                           "ON CONFLICT (counter, key) DO UPDATE SET count = count + excluded.count",
+                           [(counter, key, amount) for key, amount in deltas.items()])
+            _bump_counter_version(db, counter)
+
+    def counter_versions(self):
+        """Returns {counter: version}; a counter's version goes up by one with every write to it."""
+        rows = self.db().execute("SELECT key, value FROM meta WHERE key LIKE 'counter_version:%'").fetchall()
+        return {key[len("counter_version:"):]: int(value) for key, value in rows}
+
+    def get_counts(self, counter):
+        return dict(self.db().execute("SELECT key, count FROM counters WHERE counter = ?", (counter,)).fetchall())
+
+    def delete_counts(self, counter):
+        with self.transaction() as db:
+            db.execute("DELETE FROM counters WHERE counter = ?", (counter,))
+
+    def add_users(self, chat_ids):
+        if not chat_ids:
+            return
+        with self.transaction() as db:
+            db.executemany("INSERT OR IGNORE INTO users (chat_id) VALUES (?)", [(int(c),) for c in chat_ids])
+
+    def has_user(self, chat_id):
+        return self.db().execute("SELECT 1 FROM users WHERE chat_id = ?", (int(chat_id),)).fetchone() is not None
+
+    def user_ids(self):
+        return [row[0] for row in self.db().execute("SELECT chat_id FROM users")]
+
+    def user_count(self):
+        return self.db().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    # --- Heavy-hitters summaries ---
+    def load_sketch(self, name):
+        """Returns (total, [(key, count, error)]) for a saved SpaceSaving summary."""
+        db = self.db()
+        row = db.execute("SELECT value FROM meta WHERE key = ?", (f"sketch_total:{name}",)).fetchone()
+        rows = db.execute("SELECT key, count, error FROM sketches WHERE name = ?", (name,)).fetchall()
+        return (int(row[0]) if row else 0), rows
+
+    def save_sketch(self, name, total, rows):
+        """Replaces a saved SpaceSaving summary; it's bounded, so this stays small."""
+        with self.transaction() as db:
+            db.execute("DELETE FROM sketches WHERE name = ?", (name,))
+            db.executemany("INSERT INTO sketches (name, key, count, error) VALUES (?, ?, ?, ?)",
+                           [(name, *row) for row in rows])
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (f"sketch_total:{name}", str(total)))
+
+    # --- Analytics time series ---
+    def add_series(self, deltas):
+        """Adds {(resolution, bucket, metric): amount} to the time series buckets in one transaction."""
+        if not deltas:
+            return
+        with self.transaction() as db:
+            db.executemany("INSERT INTO series (resolution, bucket, metric, count) VALUES (?, ?, ?, ?) "
+                           "ON CONFLICT (resolution, bucket, metric) DO UPDATE SET count = count + excluded.count",
+                           [(*key, amount) for key, amount in deltas.items()])
+
+    def get_series(self, resolution, oldest_bucket):
+        """Returns (bucket, metric, count) rows for resolution from oldest_bucket on."""
+        return self.db().execute("SELECT bucket, metric, count FROM series WHERE resolution = ? AND bucket >= ?",
+                                 (resolution, oldest_bucket)).fetchall()
+
+    def prune_series(self, resolution, oldest_bucket):
+        """Deletes buckets of resolution older than oldest_bucket."""
+        with self.transaction() as db:
+            db.execute("DELETE FROM series WHERE resolution = ? AND bucket < ?", (resolution, oldest_bucket))
+
+    # --- Importing the old JSON files ---
+    def import_json(self, analytics_path, users_path, dialects_path, force=False):
+        """
+        One-shot import of the JSON analytics file, the int64 users file and the JSON
+        dialects file. Runs once per database (recorded in the meta table) unless force
+        is set. Counters keep the larger of the stored and imported count and existing
+        dialect rows win, so importing the same files twice changes nothing.
+        Returns True if an import happened.
+        """
+        if not force and self.db().execute("SELECT 1 FROM meta WHERE key = 'json_imported'").fetchone():
+            return False
+        analytics = _read_json(analytics_path) or {}
+        dialects = _read_json(dialects_path) or {}
+        users = set(read_int64_file(users_path))
+        for str_chat_id in analytics.get("unique_users", []): # Older files listed users in the JSON
+            try:
+                users.add(int(str_chat_id))
+            except (TypeError, ValueError):
+                continue
+        with self.transaction() as db:
+            for key in COUNTER_KEYS + (SEARCHES_KEY,): # Searches get folded into their summary on load
+                db.executemany("INSERT INTO counters (counter, key, count) VALUES (?, ?, ?) "
+                               "ON CONFLICT (counter, key) DO UPDATE SET count = MAX(count, excluded.count)",
+                               [(key, item, amount) for item, amount in analytics.get(key, {}).items()])
+                _bump_counter_version(db, key)
+            self.add_users(users)
+            db.executemany("INSERT OR IGNORE INTO dialects (chat_id, dialect) VALUES (?, ?)", dialects.items())
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported', '1')")
+        if not (analytics or dialects or users):
+            return False # Nothing to import (a fresh install)
+        print(f"Imported {len(users)} users and {len(dialects)} user dialects into {self.path}.")
+        return True
+
+def _bump_counter_version(db, counter):
+    db.execute("INSERT INTO meta (key, value) VALUES (?, '1') "
+               "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1", (f"counter_version:{counter}",))
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Error reading {path}: {e}. Skipping it.")
+        return None
+
+class _Transaction:
+    def __init__(self, conn):
+        self.conn = conn
+        self.outer = False
+
+    def __enter__(self):
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.outer = True
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.outer:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+if __name__ == "__main__":
+    # Usage: python sqlite_store.py DB_PATH [ANALYTICS_JSON USERS_BIN DIALECTS_JSON]
+    # Re-runs the JSON import even if the database already has one recorded
+    paths = sys.argv[2:] or ["analytics_data.json", "analytics_users.bin", "user_dialects.json"]
+    SQLiteStore(sys.argv[1]).import_json(*paths, force=True)
@@ -0,0 +1,205 @@
+import json
+import time
+import uuid
+import base64
+import sqlite3
+import threading
+from array import array
+
+from state_store import FlowStateStore, DEFAULT_FLOW_TTLS, DEFAULT_TTL
+
+class LocalBackend:
+    """
+    In-process state backend: flows live in a FlowStateStore and dialect preferences are
+    cached in memory over the SQLite store. Only consistent with a single worker process.
+    """
+    shared = False
+
+    def __init__(self, store, max_flows=10000):
+        self.store = store
+        self.flows = FlowStateStore(max_flows)
+        self._dialects = {} # Stores chat_id (str): "slang" | "formal"
+
+    def load(self):
+        """
+        Loads user dialect preferences from the store.
+        """
+        self._dialects = self.store.all_dialects()
+        print(f"Successfully loaded {len(self._dialects)} user dialects.")
+
+    def start(self, sweep_interval):
+        self.flows.start(sweep_interval)
+
+    def get_dialect(self, chat_id):
+        return self._dialects.get(str(chat_id))
+
+    def set_dialect(self, chat_id, dialect):
+        self._dialects[str(chat_id)] = dialect
+        try:
+            self.store.set_dialect(chat_id, dialect)
+        except sqlite3.Error as e:
+            print(f"Error saving user dialect: {e}")
+
+# --- Shared (SQLite) backend ---
+def _encode_state(state):
+    # Flow states are JSON, except result indices, which stay compact as base64'd arrays
+    encoded = {}
+    for key, value in state.items():
+        if isinstance(value, array):
+            value = {"__array__": value.typecode, "data": base64.b64encode(value.tobytes()).decode()}
+        encoded[key] = value
+    return json.dumps(encoded, separators=(",", ":"))
+
+def _decode_state(raw):
+    state = json.loads(raw)
+    for key, value in state.items():
+        if isinstance(value, dict) and "__array__" in value:
+            decoded = array(value["__array__"])
+            decoded.frombytes(base64.b64decode(value["data"]))
+            state[key] = decoded
+    return state
+
+class SharedFlowState(dict):
+    """
+    A flow state read from the shared store. Setting a key writes the state back, unless
+    the chat has started a different flow since (checked via the state's token).
+    """
+
+    def __init__(self, store, chat_id, token, state):
+        super().__init__(state)
+        self._store = store
+        self._chat_id = chat_id
+        self.token = token
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._store.write_back(self._chat_id, self)
+
+class SQLiteFlowStore:
+    """Dict-like flow store over the shared SQLite database, with the same per-flow idle TTLs as FlowStateStore."""
+
+    def __init__(self, store, flow_ttls=None, default_ttl=DEFAULT_TTL):
+        self._store = store
+        self.flow_ttls = dict(DEFAULT_FLOW_TTLS if flow_ttls is None else flow_ttls)
+        self.default_ttl = default_ttl
+        self.expired = 0
+        self.evicted = 0 # Disk-backed, so nothing is evicted for capacity
+        self._sweeper = None
+
+    def _ttl(self, state):
+        return self.flow_ttls.get(state.get("flow"), self.default_ttl)
+
+    def get(self, chat_id, default=None):
+        now = time.time()
+        with self._store.transaction() as db:
+            row = db.execute("SELECT token, state FROM flows WHERE chat_id = ? AND expires_at > ?",
+                             (str(chat_id), now)).fetchone()
+            if row is None:
+                return default
+            state = SharedFlowState(self, chat_id, row[0], _decode_state(row[1]))
+            db.execute("UPDATE flows SET expires_at = ? WHERE chat_id = ?", (now + self._ttl(state), str(chat_id)))
+        return state
+
+    def __getitem__(self, chat_id):
+        state = self.get(chat_id)
+        if state is None:
+            raise KeyError(chat_id)
+        return state
+
+    def __contains__(self, chat_id):
+        row = self._store.db().execute("SELECT 1 FROM flows WHERE chat_id = ? AND expires_at > ?",
+                                         (str(chat_id), time.time())).fetchone()
+        return row is not None
+
+    def __setitem__(self, chat_id, state):
+        token = uuid.uuid4().hex
+        with self._store.transaction() as db:
+            db.execute("INSERT OR REPLACE INTO flows (chat_id, flow, token, state, expires_at) VALUES (?, ?, ?, ?, ?)",
+                       (str(chat_id), state.get("flow"), token, _encode_state(state), time.time() + self._ttl(state)))
+        if isinstance(state, SharedFlowState):
+            state.token = token
+
+    def write_back(self, chat_id, state):
+        """Saves a modified SharedFlowState if it's still the chat's current flow."""
+        with self._store.transaction() as db:
+            db.execute("UPDATE flows SET state = ?, expires_at = ? WHERE chat_id = ? AND token = ?",
+                       (_encode_state(state), time.time() + self._ttl(state), str(chat_id), state.token))
+
+    def refresh(self, chat_id, state):
+        """Returns the stored copy of state if it's still the chat's current flow, else state itself."""
+        current = self.get(chat_id)
+        if current is not None and current.token == getattr(state, "token", None):
+            return current
+        return state
+
+    def __delitem__(self, chat_id):
+        with self._store.transaction() as db:
+            if db.execute("DELETE FROM flows WHERE chat_id = ?", (str(chat_id),)).rowcount == 0:
+                raise KeyError(chat_id)
+
+    def pop(self, chat_id, default=None):
+        state = self.get(chat_id)
+        if state is None:
+            return default
+        with self._store.transaction() as db:
+            db.execute("DELETE FROM flows WHERE chat_id = ?", (str(chat_id),))
+        return state
+
+    def __len__(self):
+        return self._store.db().execute("SELECT COUNT(*) FROM flows WHERE expires_at > ?", (time.time(),)).fetchone()[0]
+
+    def sweep(self):
+        """Deletes every expired flow; returns how many were dropped."""
+        with self._store.transaction() as db:
+            dropped = db.execute("DELETE FROM flows WHERE expires_at <= ?", (time.time(),)).rowcount
+        self.expired += dropped
+        return dropped
+
+    def start(self, interval=60.0):
+        """Starts a daemon thread that calls sweep() every `interval` seconds."""
+        if self._sweeper is not None:
+            return
+        def run():
+            while True:
+                time.sleep(interval)
+                self.sweep()
+        self._sweeper = threading.Thread(target=run, name="state-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stats(self):
+        rows = self._store.db().execute(
+            "SELECT flow, COUNT(*) FROM flows WHERE expires_at > ? GROUP BY flow", (time.time(),)).fetchall()
+        return {"live": dict(rows), "expired": self.expired, "evicted": self.evicted}
+
+class SQLiteBackend:
+    """
+    Shared state backend: flows and dialect preferences are read from and written to the
+    SQLite store on every access, so several worker processes (e.g. gunicorn workers)
+    see the same state.
+    Only the state is shared: each process still has its own OutboundQueue and
+    RateLimiter. Per-chat send order and per-chat pacing only hold if every update for a
+    chat reaches the same process (sticky routing by chat), and the global send cap
+    (TELEGRAM_GLOBAL_RATE) applies per process, so set it to the bot's limit divided by
+    the number of processes.
+    """
+    shared = True
+
+    def __init__(self, store):
+        self.store = store
+        self.flows = SQLiteFlowStore(store)
+
+    def load(self):
+        count = self.store.db().execute("SELECT COUNT(*) FROM dialects").fetchone()[0]
+        print(f"Using shared state database {self.store.path} ({count} user dialects).")
+
+    def start(self, sweep_interval):
+        self.flows.start(sweep_interval)
+
+    def get_dialect(self, chat_id):
+        return self.store.get_dialect(chat_id)
+
+    def set_dialect(self, chat_id, dialect):
+        try:
+            self.store.set_dialect(chat_id, dialect)
+        except sqlite3.Error as e:
+            print(f"Error saving user dialect: {e}")
@@ -0,0 +1,118 @@
+import time
+import threading
+from collections import OrderedDict, Counter
+
+DEFAULT_FLOW_TTLS = { # Seconds a flow may sit idle before it's dropped
+    "game_request": 30 * 60,
+    "feedback": 30 * 60,
+    "search_pagination": 6 * 60 * 60,
+}
+DEFAULT_TTL = 60 * 60 # For flows not listed above
+
+class FlowStateStore:
+    """
+    Bounded, dict-like store for per-chat conversation state ({"flow": ..., ...} dicts).
+    Entries expire after their flow's idle TTL (every read or write refreshes it), and the
+    least recently used entry is evicted once `max_entries` is reached. Expired entries
+    are dropped lazily on access and by sweep(), which start() runs periodically.
+    """
+
+    def __init__(self, max_entries=10000, flow_ttls=None, default_ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.flow_ttls = dict(DEFAULT_FLOW_TTLS if flow_ttls is None else flow_ttls)
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict() # Stores chat_id: [state, last_touched], least recent first
+        self._lock = threading.RLock()
+        self._sweeper = None
+        # Metrics
+        self.expired = 0
+        self.evicted = 0
+
+    def _ttl(self, state):
+        return self.flow_ttls.get(state.get("flow"), self.default_ttl)
+
+    def _live_entry(self, chat_id, now):
+        # Caller holds self._lock; returns the entry, dropping it first if it has expired
+        entry = self._entries.get(chat_id)
+        if entry is not None and now - entry[1] > self._ttl(entry[0]):
+            del self._entries[chat_id]
+            self.expired += 1
+            return None
+        return entry
+
+    # --- dict interface ---
+    def get(self, chat_id, default=None):
+        with self._lock:
+            now = time.monotonic()
+            entry = self._live_entry(chat_id, now)
+            if entry is None:
+                return default
+            entry[1] = now
+            self._entries.move_to_end(chat_id)
+            return entry[0]
+
+    def __getitem__(self, chat_id):
+        state = self.get(chat_id)
+        if state is None:
+            raise KeyError(chat_id)
+        return state
+
+    def __contains__(self, chat_id):
+        return self.get(chat_id) is not None
+
+    def __setitem__(self, chat_id, state):
+        with self._lock:
+            self._entries[chat_id] = [state, time.monotonic()]
+            self._entries.move_to_end(chat_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+
+    def __delitem__(self, chat_id):
+        with self._lock:
+            del self._entries[chat_id]
+
+    def pop(self, chat_id, default=None):
+        with self._lock:
+            entry = self._entries.pop(chat_id, None)
+            return default if entry is None else entry[0]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def refresh(self, chat_id, state):
+        """Returns the current copy of a state read earlier; in-process states always are current."""
+        return state
+
+    # --- Expiry ---
+    def sweep(self):
+        """Drops every expired entry; returns how many were dropped."""
+        min_ttl = min([self.default_ttl, *self.flow_ttls.values()])
+        dropped = 0
+        with self._lock:
+            now = time.monotonic()
+            for chat_id, (state, touched) in list(self._entries.items()):
+                if now - touched <= min_ttl:
+                    break # Entries are ordered by last touch, so the rest are younger still
+                if now - touched > self._ttl(state):
+                    del self._entries[chat_id]
+                    dropped += 1
+            self.expired += dropped
+        return dropped
+
+    def start(self, interval=60.0):
+        """Starts a daemon thread that calls sweep() every `interval` seconds."""
+        if self._sweeper is not None:
+            return
+        def run():
+            while True:
+                time.sleep(interval)
+                self.sweep()
+        self._sweeper = threading.Thread(target=run, name="state-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stats(self):
+        """Returns live entries per flow plus expiry and eviction counters."""
+        with self._lock:
+            live = Counter(entry[0].get("flow") for entry in self._entries.values())
+            return {"live": dict(live), "expired": self.expired, "evicted": self.evicted}
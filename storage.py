@@ -0,0 +1,42 @@
+import os
+import sys
+import tempfile
+from array import array
+
+def atomic_write_bytes(path, data):
+    """
+    Writes data to path atomically: the bytes go to a temp file in the same directory,
+    which then replaces path, so readers never see a half-written file.
+    Raises OSError on failure (the original file is left untouched).
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def read_int64_file(path):
+    """
+    Reads a file of raw little-endian int64 records, 8 bytes each (the users file older
+    versions appended to), into an array('q').
+    A torn trailing record from an interrupted append is ignored.
+    Returns an empty array if the file doesn't exist.
+    """
+    values = array('q')
+    if not os.path.exists(path):
+        return values
+    with open(path, 'rb') as f:
+        raw = f.read()
+    values.frombytes(raw[:len(raw) - len(raw) % values.itemsize])
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
@@ -0,0 +1,94 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limit import PRIORITY_INTERACTIVE
+
+API_URL = "https://api.telegram.org/bot{token}"
+RATE_LIMITED_PREFIXES = ("send", "edit", "copy", "forward") # Methods that post into a chat
+
+class RetryAfter(Exception):
+    """Raised by TelegramClient.call(retry_later=True) on a 429: the call may be retried after `retry_after` seconds."""
+
+    def __init__(self, method, retry_after):
+        super().__init__(f"{method} rate limited, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class TelegramClient:
+    """
+    Thin Bot API client over one pooled keep-alive session.
+    Every call has connect/read timeouts and never raises on network or API errors:
+    failures are logged and the call returns None, otherwise it returns the `result`
+    field of Telegram's response.
+    With a limiter, chat sends are paced by it. A 429 response is reported to the limiter
+    (the chat isn't ready for retry_after seconds) and the call fails; it never sleeps.
+    Calls made with retry_later=True raise RetryAfter instead, so the outbound queue can
+    run them again once the wait is over (up to max_retries times).
+    """
+
+    def __init__(self, token, connect_timeout=5.0, read_timeout=15.0, pool_size=20, limiter=None, max_retries=3):
+        self.base_url = API_URL.format(token=token)
+        self.timeout = (connect_timeout, read_timeout)
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def call(self, method, priority=PRIORITY_INTERACTIVE, retry_later=False, **params):
+        """Calls a Bot API method; parameters left as None are omitted from the payload."""
+        payload = {key: value for key, value in params.items() if value is not None}
+        chat_id = payload.get("chat_id")
+        limited = self.limiter is not None and chat_id is not None and method.startswith(RATE_LIMITED_PREFIXES)
+        if limited:
+            self.limiter.acquire(chat_id, priority)
+        try:
+            response = self.session.post(f"{self.base_url}/{method}", json=payload, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            print(f"Telegram {method} request failed: {e}")
+            return None
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        if response.status_code == 429:
+            retry_after = body.get("parameters", {}).get("retry_after", 1)
+            print(f"Telegram {method} rate limited for chat {chat_id}, retry after {retry_after}s")
+            if self.limiter is not None:
+                self.limiter.penalize(chat_id if limited else None, retry_after)
+            if retry_later:
+                raise RetryAfter(method, retry_after)
+        if response.status_code != 200 or not body.get("ok"):
+            print(f"Telegram {method} failed: {response.status_code} - {response.text}")
+            return None
+        return body.get("result")
+
+    # --- Typed helpers ---
+    def send_message(self, chat_id, text, parse_mode=None, reply_markup=None, reply_to_message_id=None, **params):
+        return self.call("sendMessage", chat_id=chat_id, text=text, parse_mode=parse_mode,
+                         reply_markup=reply_markup, reply_to_message_id=reply_to_message_id, **params)
+
+    def send_photo(self, chat_id, photo, caption=None, parse_mode=None, reply_markup=None, **params):
+        return self.call("sendPhoto", chat_id=chat_id, photo=photo, caption=caption,
+                         parse_mode=parse_mode, reply_markup=reply_markup, **params)
+
+    def send_media_group(self, chat_id, media, **params):
+        return self.call("sendMediaGroup", chat_id=chat_id, media=media, **params)
+
+    def edit_message_media(self, chat_id, message_id, media, reply_markup=None, **params):
+        return self.call("editMessageMedia", chat_id=chat_id, message_id=message_id, media=media,
+                         reply_markup=reply_markup, **params)
+
+    def edit_message_text(self, chat_id, message_id, text, parse_mode=None, reply_markup=None, **params):
+        return self.call("editMessageText", chat_id=chat_id, message_id=message_id, text=text,
+                         parse_mode=parse_mode, reply_markup=reply_markup, **params)
+
+    def delete_message(self, chat_id, message_id, **params):
+        return self.call("deleteMessage", chat_id=chat_id, message_id=message_id, **params)
+
+    def answer_callback_query(self, callback_query_id, text=None, **params):
+        return self.call("answerCallbackQuery", callback_query_id=callback_query_id, text=text, **params)
+
+    def answer_inline_query(self, inline_query_id, results, cache_time=None, **params):
+        return self.call("answerInlineQuery", inline_query_id=inline_query_id, results=results,
+                         cache_time=cache_time, **params)
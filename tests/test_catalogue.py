@@ -0,0 +1,93 @@
+import random
+
+from catalogue import GameCatalogue
+
+def make_games(count, seed):
+    rng = random.Random(seed)
+    return [{"url": "/games/%d" % i, "title": "game %d" % rng.randrange(50),
+             "modified": "2024-01-%02d" % rng.randrange(1, 8)} for i in range(count)]
+
+def assert_same_as_fresh(catalogue):
+    fresh = GameCatalogue(catalogue.games)
+    assert list(catalogue._latest) == list(fresh._latest)
+    assert catalogue._by_url.keys() == fresh._by_url.keys()
+    assert all(catalogue._by_url[url] is game for url, game in fresh._by_url.items())
+    assert catalogue.latest(10) == fresh.latest(10)
+    assert catalogue.search("game 1") == fresh.search("game 1")
+
+def test_unchanged_list_returns_same_catalogue():
+    games = make_games(50, seed=1)
+    catalogue = GameCatalogue(games)
+    updated, diff = catalogue.updated([dict(g) for g in games])
+    assert updated is catalogue
+    assert diff == {"added": [], "changed": [], "removed": []}
+
+def test_updated_equals_fresh_build():
+    games = make_games(200, seed=2)
+    catalogue = GameCatalogue(games)
+    new = [dict(g) for g in games]
+    del new[150:160] # Removed
+    new[3]["modified"] = "2024-01-09" # Changed, and now the newest
+    new[40]["title"] = "renamed" # Changed content, same date
+    new.insert(20, {"url": "/games/new1", "title": "game 1", "modified": "2024-01-04"})
+    new.append({"url": "/games/new2", "title": "new", "modified": "2024-01-01"})
+    updated, diff = catalogue.updated(new)
+    assert sorted(diff["changed"]) == ["/games/3", "/games/40"]
+    assert diff["added"] == ["/games/new1", "/games/new2"]
+    assert len(diff["removed"]) == 10
+    assert updated.latest(1)[0]["url"] == "/games/3"
+    assert updated.get("/games/155") is None
+    assert updated.get("/games/7") is games[7] # Unchanged games are reused
+    assert_same_as_fresh(updated)
+
+def test_updated_reordered_equals_fresh_build():
+    games = make_games(200, seed=3)
+    catalogue = GameCatalogue(games)
+    new = [dict(g) for g in games]
+    new[10], new[90] = new[90], new[10]
+    new[5]["modified"] = "2024-01-03"
+    updated, _ = catalogue.updated(new)
+    assert_same_as_fresh(updated)
+
+def test_duplicate_urls_keep_first_entry():
+    games = make_games(100, seed=4)
+    catalogue = GameCatalogue(games)
+    new = [dict(g) for g in games]
+    new[50]["title"] = "changed"
+    new.append({"url": "/games/50", "title": "duplicate", "modified": "2024-01-05"})
+    updated, _ = catalogue.updated(new)
+    assert updated.get("/games/50")["title"] == "changed"
+    assert_same_as_fresh(updated)
+
+def test_random_updates_equal_fresh_build():
+    rng = random.Random(5)
+    catalogue = GameCatalogue(make_games(300, seed=6))
+    next_url = 1000
+    for _ in range(30):
+        new = [dict(g) for g in catalogue.games]
+        for _ in range(rng.randrange(1, 15)):
+            action = rng.randrange(3)
+            if action == 0 and new:
+                del new[rng.randrange(len(new))]
+            elif action == 1 and new:
+                new[rng.randrange(len(new))]["modified"] = "2024-01-%02d" % rng.randrange(1, 10)
+            else:
+                new.insert(rng.randrange(len(new) + 1), {"url": "/games/%d" % next_url, "title": "game %d" % next_url,
+                                                         "modified": "2024-01-%02d" % rng.randrange(1, 10)})
+                next_url += 1
+        catalogue, _ = catalogue.updated(new)
+        assert_same_as_fresh(catalogue)
+
+def test_version_comes_from_content():
+    games = make_games(20, seed=7)
+    assert GameCatalogue(games).version == GameCatalogue([dict(g) for g in games]).version
+    changed = [dict(g) for g in games]
+    changed[3]["title"] = "renamed"
+    assert GameCatalogue(changed).version != GameCatalogue(games).version
+    assert GameCatalogue(games[:5]).version != GameCatalogue(games).version
+    updated, _ = GameCatalogue(games).updated(changed)
+    assert updated.version == GameCatalogue(changed).version
+
+def test_games_at_skips_positions_past_the_end():
+    games = make_games(5, seed=8)
+    assert GameCatalogue(games).games_at([4, 5, 12]) == [games[4]]
@@ -0,0 +1,19 @@
+import pytest
+
+from catalogue_source import check_games
+
+GAME = {"url": "/games/a", "title": "A", "modified": "2024-01-01", "tags": []}
+
+def test_check_games_accepts_well_formed_games():
+    check_games([GAME, dict(GAME, url="/games/b")])
+    check_games([])
+
+@pytest.mark.parametrize("games", [
+    [GAME, "not a game"],
+    [GAME, {"url": "/games/b", "title": "B"}], # No "modified"
+    [{"url": "/games/b", "title": None, "modified": "2024-01-01"}],
+    [{"url": 3, "title": "B", "modified": "2024-01-01"}],
+])
+def test_check_games_rejects_malformed_games(games):
+    with pytest.raises(ValueError):
+        check_games(games)
@@ -0,0 +1,73 @@
+import random
+from collections import Counter
+
+from heavy_hitters import SpaceSaving
+
+def zipf_stream(length, keys, seed):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(keys)]
+    return rng.choices(["key%d" % rank for rank in range(keys)], weights, k=length)
+
+def test_exact_below_capacity():
+    sketch = SpaceSaving(capacity=10)
+    for key in "abracadabra":
+        sketch.offer(key)
+    assert sketch.max_error() == 0
+    assert sketch.top(1) == [("a", 5, 0)]
+    assert sorted(sketch.rows()) == sorted((key, count, 0) for key, count in Counter("abracadabra").items())
+
+def test_error_bounds_under_eviction():
+    stream = zipf_stream(20000, keys=2000, seed=1)
+    true = Counter(stream)
+    sketch = SpaceSaving(capacity=50)
+    for key in stream:
+        sketch.offer(key)
+    assert len(sketch) == 50
+    assert sketch.total == len(stream)
+    max_error = sketch.max_error()
+    assert 0 < max_error <= len(stream) / 50
+    for key, count, error in sketch.rows():
+        assert true[key] <= count <= true[key] + error
+        assert error <= max_error
+    # Untracked keys can't have been seen more than max_error times
+    tracked = {key for key, _, _ in sketch.rows()}
+    assert all(count <= max_error for key, count in true.items() if key not in tracked)
+
+def test_top_k_under_eviction():
+    stream = zipf_stream(20000, keys=2000, seed=2)
+    true = Counter(stream)
+    sketch = SpaceSaving(capacity=100)
+    for key in stream:
+        sketch.offer(key)
+    top = sketch.top(5)
+    assert [count for _, count, _ in top] == sorted((count for _, count, _ in top), reverse=True)
+    # The heaviest keys are far above the error bound, so they are tracked and ranked correctly
+    assert [key for key, _, _ in top] == [key for key, _ in true.most_common(5)]
+
+def test_weighted_offers():
+    sketch = SpaceSaving(capacity=2)
+    sketch.offer("a", 5)
+    sketch.offer("b", 3)
+    sketch.offer("c", 1) # Evicts b (3), inheriting its count as error
+    assert sketch.total == 9
+    assert sorted(sketch.rows()) == [("a", 5, 0), ("c", 4, 3)]
+    assert sketch.max_error() == 4
+
+def test_rows_round_trip():
+    sketch = SpaceSaving(capacity=20)
+    for key in zipf_stream(5000, keys=300, seed=3):
+        sketch.offer(key)
+    restored = SpaceSaving.from_rows(20, sketch.total, sketch.rows())
+    assert sorted(restored.rows()) == sorted(sketch.rows())
+    assert restored.total == sketch.total
+    assert restored.max_error() == sketch.max_error()
+    # Both carry on identically
+    for key in zipf_stream(2000, keys=300, seed=4):
+        sketch.offer(key)
+        restored.offer(key)
+    assert sorted(restored.rows()) == sorted(sketch.rows())
+
+def test_from_rows_keeps_largest_when_shrinking():
+    rows = [("k%d" % i, i, 0) for i in range(1, 11)]
+    sketch = SpaceSaving.from_rows(3, 55, rows)
+    assert sorted(sketch.rows()) == [("k10", 10, 0), ("k8", 8, 0), ("k9", 9, 0)]
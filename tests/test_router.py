@@ -0,0 +1,67 @@
+import pytest
+
+from message_catalogue import MessageCatalogue
+from router import Router
+
+MESSAGES = {
+    "slang": {"help_button": "Wot's This?", "cancel_button": "Nah, Cancel"},
+    "formal": {"help_button": "Help", "cancel_button": "Cancel"},
+}
+
+def handler(chat_id, text):
+    pass
+
+def other(chat_id, text):
+    pass
+
+@pytest.fixture
+def router():
+    router = Router(MessageCatalogue(MESSAGES, default="slang"))
+    router.message("/help", button="help_button")(handler)
+    router.message("/cancel", button="cancel_button", before_flows=True, exact=True)(other)
+    router.message("/admin_status", admin=True, before_flows=True, exact=True)(other)
+    return router
+
+def test_commands(router):
+    assert router.match_message("/help", "slang") == (handler, False, False)
+    assert router.match_message("/cancel", "formal") == (other, False, True)
+    assert router.match_message("/admin_status", "slang") == (other, True, True)
+    assert router.match_message("/nope", "slang") is None
+
+def test_command_botname_suffix_and_arguments(router):
+    assert router.match_message("/help@somebot", "slang") == (handler, False, False)
+    assert router.match_message("/help please", "slang") == (handler, False, False)
+    assert router.match_message("/help@somebot please", "slang") == (handler, False, False)
+    assert router.match_message("/helpme", "slang") is None
+
+def test_exact_commands_take_no_arguments(router):
+    assert router.match_message("/admin_status@somebot", "slang") == (other, True, True)
+    assert router.match_message("/admin_status now", "slang") is None
+    assert router.match_message("/admin_statusx", "slang") is None
+    assert router.match_message("/cancel please", "formal") is None
+
+def test_buttons_match_in_the_senders_dialect(router):
+    assert router.match_message("wot's this?", "slang") == (handler, False, False)
+    assert router.match_message("help", "formal") == (handler, False, False)
+    assert router.match_message("cancel", "formal") == (other, False, True)
+    # Another dialect's button text is just a message
+    assert router.match_message("help", "slang") is None
+    assert router.match_message("wot's this?", "formal") is None
+
+def test_unknown_dialect_uses_default_buttons(router):
+    assert router.match_message("nah, cancel", "pirate") == (other, False, True)
+    assert router.match_message("cancel", "pirate") is None
+
+def test_callbacks_split_on_first_colon():
+    router = Router(MessageCatalogue(MESSAGES))
+    router.callback("details", "share_game")(handler)
+    assert router.match_callback("details:/games/a:b") == (handler, "/games/a:b")
+    assert router.match_callback("share_game") == (handler, "")
+    assert router.match_callback("unknown:x") == (None, "x")
+
+def test_flows():
+    router = Router(MessageCatalogue(MESSAGES))
+    router.flow("feedback")(handler)
+    assert router.match_flow("feedback") is handler
+    assert router.match_flow("game_request") is None
+    assert router.match_flow(None) is None
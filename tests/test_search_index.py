@@ -0,0 +1,87 @@
+import random
+
+import pytest
+
+from search_index import TitleIndex
+
+ALPHABET = "abcmrio KM" # Small, so short queries match many titles and long ones some
+
+def make_games(count, seed):
+    rng = random.Random(seed)
+    return [{"title": "".join(rng.choice(ALPHABET) for _ in range(rng.randrange(0, 12)))}
+            for _ in range(count)]
+
+def naive(games, query):
+    return [g for g in games if query.lower() in g["title"].lower()]
+
+GAMES = make_games(300, seed=1) + [{"title": "Super Mario Bros"}, {"title": "Mario Kart"}, {"title": "MARIO"}]
+
+@pytest.mark.parametrize("query", [
+    "", "a", "M", " ", "ar", "Io", "mar", "rio", "xyz",
+    "mari", "Mario", "mario k", "super mario bros", "abcabc", "zzzz",
+])
+def test_search_matches_naive_scan(query):
+    index = TitleIndex(GAMES)
+    expected = naive(GAMES, query)
+    assert index.search(query) == expected
+    assert [GAMES[i] for i in index.search_indices(query)] == expected
+
+def test_search_every_substring():
+    games = make_games(200, seed=2)
+    index = TitleIndex(games)
+    queries = {g["title"][i:j] for g in games[:40] for i in range(len(g["title"])) for j in range(i + 1, len(g["title"]) + 1)}
+    for query in queries:
+        assert index.search(query) == naive(games, query), query
+
+def test_refine_indices_narrows_to_longer_query():
+    index = TitleIndex(GAMES)
+    assert index.refine_indices(index.search_indices("mar"), "mario") == index.search_indices("mario")
+    assert index.refine_indices(index.search_indices("mario"), "mario k") == index.search_indices("mario k")
+
+def assert_same_index(index, games):
+    fresh = TitleIndex(games)
+    assert index._postings == fresh._postings
+    for query in ["a", "mo", "rio", "mari", "o K"]:
+        assert index.search(query) == naive(games, query)
+
+def test_updated_in_place_changes_equal_fresh_build():
+    old = make_games(100, seed=3)
+    new = list(old)
+    positions = list(range(len(old)))
+    for i in (5, 17, 60):
+        new[i] = {"title": "Mario " + old[i]["title"]}
+        positions[i] = -1
+    new.append({"title": "brand new"})
+    positions.append(-1)
+    assert_same_index(TitleIndex(old).updated(new, positions), new)
+
+def test_updated_removals_at_end_equal_fresh_build():
+    old = make_games(100, seed=4)
+    new = old[:90]
+    assert_same_index(TitleIndex(old).updated(new, list(range(90))), new)
+
+def test_updated_moved_games_equal_fresh_build():
+    old = make_games(100, seed=5)
+    rng = random.Random(6)
+    kept = sorted(rng.sample(range(len(old)), 70))
+    new = [old[j] for j in kept]
+    positions = list(kept)
+    for i in (0, 30, 50):
+        new.insert(i, {"title": "inserted %d mario" % i})
+        positions.insert(i, -1)
+    assert_same_index(TitleIndex(old).updated(new, positions), new)
+
+def test_updated_reordered_games_equal_fresh_build():
+    old = make_games(100, seed=7)
+    order = list(range(len(old)))
+    random.Random(8).shuffle(order)
+    new = [old[j] for j in order]
+    assert_same_index(TitleIndex(old).updated(new, order), new)
+
+def test_updated_leaves_old_index_untouched():
+    old = make_games(50, seed=9)
+    index = TitleIndex(old)
+    before = {gram: list(posting) for gram, posting in index._postings.items()}
+    new = old[10:] + [{"title": "mario"}]
+    index.updated(new, list(range(10, 50)) + [-1])
+    assert {gram: list(posting) for gram, posting in index._postings.items()} == before
@@ -0,0 +1,88 @@
+import pytest
+
+import state_store
+from state_store import FlowStateStore
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(state_store.time, "monotonic", clock)
+    return clock
+
+def make_store(**kwargs):
+    kwargs.setdefault("flow_ttls", {"short": 10, "long": 100})
+    kwargs.setdefault("default_ttl", 50)
+    return FlowStateStore(**kwargs)
+
+def test_dict_interface(clock):
+    store = make_store()
+    store[1] = {"flow": "short"}
+    assert store[1] == {"flow": "short"}
+    assert 1 in store and 2 not in store
+    assert store.get(2, "missing") == "missing"
+    with pytest.raises(KeyError):
+        store[2]
+    assert store.pop(1) == {"flow": "short"}
+    assert store.pop(1, "gone") == "gone"
+    assert len(store) == 0
+
+def test_entries_expire_after_their_flow_ttl(clock):
+    store = make_store()
+    store[1] = {"flow": "short"}
+    store[2] = {"flow": "long"}
+    store[3] = {"flow": "unlisted"}
+    clock.now += 10
+    assert 1 in store # Exactly at the TTL is still live
+    clock.now += 11
+    assert store.get(1) is None
+    assert store.get(3) == {"flow": "unlisted"} # Default TTL of 50
+    clock.now += 51
+    assert 3 not in store
+    assert store.get(2) == {"flow": "long"}
+    assert store.expired == 2
+
+def test_reads_refresh_the_ttl(clock):
+    store = make_store()
+    store[1] = {"flow": "short"}
+    for _ in range(5):
+        clock.now += 8
+        assert store.get(1) is not None
+    clock.now += 11
+    assert store.get(1) is None
+
+def test_least_recently_used_entry_is_evicted(clock):
+    store = make_store(max_entries=3)
+    for chat_id in (1, 2, 3):
+        store[chat_id] = {"flow": "long"}
+    store.get(1) # Now 2 is the least recently used
+    store[4] = {"flow": "long"}
+    assert 2 not in store
+    assert all(chat_id in store for chat_id in (1, 3, 4))
+    assert len(store) == 3 and store.evicted == 1
+
+def test_sweep_drops_only_expired_entries(clock):
+    store = make_store()
+    store[1] = {"flow": "short"}
+    store[2] = {"flow": "long"}
+    clock.now += 20
+    store[3] = {"flow": "short"}
+    assert store.sweep() == 1
+    assert 1 not in store and 2 in store and 3 in store
+    clock.now += 200
+    assert store.sweep() == 2
+    assert len(store) == 0
+    assert store.stats() == {"live": {}, "expired": 3, "evicted": 0}
+
+def test_stats_counts_live_entries_per_flow(clock):
+    store = make_store()
+    store[1] = {"flow": "short"}
+    store[2] = {"flow": "short"}
+    store[3] = {"flow": "long"}
+    assert store.stats()["live"] == {"short": 2, "long": 1}
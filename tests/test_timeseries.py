@@ -0,0 +1,82 @@
+from timeseries import RESOLUTIONS, TimeSeries
+
+MINUTE, HOUR, DAY = 60, 60 * 60, 24 * 60 * 60
+T0 = 1_700_000_000 // DAY * DAY # Midnight UTC, so minute, hour and day buckets all start here
+
+def test_event_lands_in_every_resolution():
+    series = TimeSeries(["searches", "games"])
+    series.add("searches", now=T0 + 59)
+    series.add("searches", 2, now=T0 + 60) # Next minute, same hour and day
+    series.add("games", now=T0 + HOUR) # Next hour, same day
+    now = T0 + HOUR
+    assert series.totals("minute", 1, now=now) == {"searches": 0, "games": 1}
+    assert series.totals("minute", 61, now=now) == {"searches": 3, "games": 1}
+    assert series.totals("hour", 1, now=now) == {"searches": 0, "games": 1}
+    assert series.totals("hour", 2, now=now) == {"searches": 3, "games": 1}
+    assert series.totals("day", 1, now=now) == {"searches": 3, "games": 1}
+
+def test_history_is_oldest_first():
+    series = TimeSeries(["searches"])
+    series.add("searches", now=T0)
+    series.add("searches", 4, now=T0 + 2 * MINUTE)
+    assert series.history("minute", 3, now=T0 + 2 * MINUTE) == [(T0, 1), (T0 + MINUTE, 0), (T0 + 2 * MINUTE, 4)]
+
+def test_minute_ring_wraps():
+    series = TimeSeries(["searches"])
+    size = RESOLUTIONS["minute"][1]
+    series.add("searches", now=T0)
+    # The slot is reused once the ring comes round; the old minute is gone but its hour stays
+    later = T0 + size * MINUTE
+    series.add("searches", 5, now=later)
+    assert series.totals("minute", size, now=later) == {"searches": 5}
+    assert series.history("minute", 1, now=later) == [(later, 5)]
+    assert series.oldest_bucket("minute", now=later) == T0 // MINUTE + 1
+    assert series.totals("hour", 3, now=later) == {"searches": 6}
+
+def test_hour_and_day_rings_wrap():
+    series = TimeSeries(["searches"])
+    hours, days = RESOLUTIONS["hour"][1], RESOLUTIONS["day"][1]
+    series.add("searches", now=T0)
+    series.add("searches", 2, now=T0 + hours * HOUR)
+    assert series.totals("hour", hours, now=T0 + hours * HOUR) == {"searches": 2}
+    assert series.totals("day", days, now=T0 + hours * HOUR) == {"searches": 3}
+    series.add("searches", 4, now=T0 + days * DAY)
+    assert series.totals("day", days, now=T0 + days * DAY) == {"searches": 6} # Day 0 has aged out
+
+def test_untouched_old_slot_reads_as_empty():
+    series = TimeSeries(["searches"], {"minute": (60, 4)})
+    series.add("searches", now=T0)
+    # Four minutes on, the slot still holds the old bucket until something is added to it
+    assert series.totals("minute", 4, now=T0 + 4 * MINUTE) == {"searches": 0}
+    assert series.totals("minute", 100, now=T0 + 3 * MINUTE) == {"searches": 1} # Capped at the ring size
+
+def test_take_pending_and_restore_after_failed_flush():
+    series = TimeSeries(["searches"], {"minute": (60, 4)})
+    series.add("searches", now=T0)
+    pending = series.take_pending()
+    assert pending == {("minute", T0 // MINUTE, "searches"): 1}
+    assert series.take_pending() == {}
+    # The write failed: put it back, merging with what was added meanwhile
+    series.add("searches", 2, now=T0 + 1)
+    series.add("searches", now=T0 + MINUTE)
+    series.restore_pending(pending)
+    assert series.take_pending() == {
+        ("minute", T0 // MINUTE, "searches"): 3,
+        ("minute", T0 // MINUTE + 1, "searches"): 1,
+    }
+    # Restoring doesn't count the events in the ring twice
+    assert series.totals("minute", 2, now=T0 + MINUTE) == {"searches": 4}
+
+def test_load_merges_database_rows_with_pending():
+    series = TimeSeries(["searches", "games"], {"minute": (60, 4)})
+    now = T0 + 10 * MINUTE
+    series.add("searches", 2, now=now)
+    bucket = now // MINUTE
+    series.load("minute", [
+        (bucket, "searches", 5),
+        (bucket - 1, "games", 3),
+        (bucket - 4, "games", 7), # Outside the ring
+        (bucket, "retired_metric", 9),
+    ], now=now)
+    assert series.totals("minute", 4, now=now) == {"searches": 7, "games": 3}
+    assert series.take_pending() == {("minute", bucket, "searches"): 2}
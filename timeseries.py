@@ -0,0 +1,110 @@
+import time
+from array import array
+
+# Resolution name: (bucket width in seconds, buckets kept)
+RESOLUTIONS = {
+    "minute": (60, 120), # Last 2 hours
+    "hour": (60 * 60, 24 * 8), # Last 8 days
+    "day": (24 * 60 * 60, 400), # Last ~13 months
+}
+
+class _Ring:
+    """Fixed ring of buckets, each holding one count per metric; slots are reused as buckets age out."""
+
+    def __init__(self, width, size, metric_count):
+        self.width = width
+        self.size = size
+        self.metric_count = metric_count
+        self.buckets = array('q', [-1]) * size # Bucket number held by each slot (-1: empty)
+        self.counts = array('Q', [0]) * (size * metric_count)
+
+    def slot(self, bucket):
+        """Returns the slot for bucket, clearing it first if it still holds an older bucket."""
+        slot = bucket % self.size
+        if self.buckets[slot] != bucket:
+            self.buckets[slot] = bucket
+            start = slot * self.metric_count
+            for i in range(start, start + self.metric_count):
+                self.counts[i] = 0
+        return slot
+
+    def get(self, bucket, metric_index):
+        slot = bucket % self.size
+        if self.buckets[slot] != bucket:
+            return 0
+        return self.counts[slot * self.metric_count + metric_index]
+
+class TimeSeries:
+    """
+    Event counts per metric in fixed-size ring buffers of minute, hour and day buckets
+    (see RESOLUTIONS). Each event is added to its minute, hour and day bucket at once, so
+    the coarser rollups are always current and finer buckets are simply overwritten once
+    they age out of their ring. Memory is fixed by RESOLUTIONS and the number of metrics.
+    Not thread-safe; AnalyticsStore calls it under its own lock.
+    """
+
+    def __init__(self, metrics, resolutions=RESOLUTIONS):
+        self.metrics = tuple(metrics)
+        self._metric_index = {metric: i for i, metric in enumerate(self.metrics)}
+        self.resolutions = tuple(resolutions)
+        self._rings = {name: _Ring(width, size, len(self.metrics)) for name, (width, size) in resolutions.items()}
+        self._pending = {} # Stores (resolution, bucket, metric): count added since take_pending()
+
+    def add(self, metric, amount=1, now=None):
+        now = time.time() if now is None else now
+        metric_index = self._metric_index[metric]
+        for name, ring in self._rings.items():
+            bucket = int(now // ring.width)
+            ring.counts[ring.slot(bucket) * ring.metric_count + metric_index] += amount
+            key = (name, bucket, metric)
+            self._pending[key] = self._pending.get(key, 0) + amount
+
+    def current_bucket(self, resolution, now=None):
+        now = time.time() if now is None else now
+        return int(now // self._rings[resolution].width)
+
+    def oldest_bucket(self, resolution, now=None):
+        """Returns the oldest bucket number the ring for resolution still holds."""
+        return self.current_bucket(resolution, now) - self._rings[resolution].size + 1
+
+    def totals(self, resolution, buckets, now=None):
+        """Returns {metric: count} summed over the last `buckets` buckets (including the current one)."""
+        ring = self._rings[resolution]
+        current = self.current_bucket(resolution, now)
+        buckets = min(buckets, ring.size)
+        return {metric: sum(ring.get(b, i) for b in range(current - buckets + 1, current + 1))
+                for i, metric in enumerate(self.metrics)}
+
+    def history(self, resolution, buckets, now=None):
+        """Returns [(bucket start timestamp, events across all metrics)] for the last `buckets` buckets, oldest first."""
+        ring = self._rings[resolution]
+        current = self.current_bucket(resolution, now)
+        buckets = min(buckets, ring.size)
+        return [(b * ring.width, sum(ring.get(b, i) for i in range(ring.metric_count)))
+                for b in range(current - buckets + 1, current + 1)]
+
+    # --- Persistence ---
+    def take_pending(self):
+        """Returns and clears the counts added since the last call, for writing to the database."""
+        pending, self._pending = self._pending, {}
+        return pending
+
+    def restore_pending(self, pending):
+        """Puts back counts from take_pending() that couldn't be written."""
+        for key, amount in pending.items():
+            self._pending[key] = self._pending.get(key, 0) + amount
+
+    def load(self, resolution, rows, now=None):
+        """
+        Replaces the ring for resolution with (bucket, metric, count) rows from the database,
+        plus any counts not yet taken by take_pending(). Rows outside the ring are ignored.
+        """
+        ring = self._rings[resolution]
+        oldest = self.oldest_bucket(resolution, now)
+        ring.buckets = array('q', [-1]) * ring.size
+        for key, amount in self._pending.items():
+            if key[0] == resolution and key[1] >= oldest and key[2] in self._metric_index:
+                ring.counts[ring.slot(key[1]) * ring.metric_count + self._metric_index[key[2]]] += amount
+        for bucket, metric, count in rows:
+            if bucket >= oldest and metric in self._metric_index:
+                ring.counts[ring.slot(bucket) * ring.metric_count + self._metric_index[metric]] += count